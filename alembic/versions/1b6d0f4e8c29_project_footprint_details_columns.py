@@ -0,0 +1,94 @@
+"""Project footprint details into typed columns
+
+Revision ID: 1b6d0f4e8c29
+Revises: e41f8c3d9a72
+Create Date: 2026-10-18 13:52:44.207615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b6d0f4e8c29'
+down_revision: Union[str, Sequence[str], None] = 'e41f8c3d9a72'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# details key -> column; "type" is stored as item_type
+CATEGORICAL_COLUMNS = {
+    'flight_type': 'flight_type',
+    'commute': 'commute',
+    'fuel_type': 'fuel_type',
+    'type': 'item_type',
+    'frequency': 'frequency',
+}
+NUMERIC_COLUMNS = [
+    'servings_per_week',
+    'orders_per_month',
+    'returns_per_month',
+    'kwh_per_month',
+    'litres_per_day',
+    'bags_per_week',
+    'kg_per_week',
+    'percent',
+    'hours_per_week',
+    'per_year',
+    'nights_per_year',
+]
+INDEXED_COLUMNS = ['fuel_type', 'commute', 'item_type']
+
+
+def _backfill_expressions(dialect: str) -> list:
+    assignments = []
+    for key, column in CATEGORICAL_COLUMNS.items():
+        if dialect == 'postgresql':
+            assignments.append(f"{column} = details->>'{key}'")
+        else:
+            assignments.append(f"{column} = json_extract(details, '$.{key}')")
+    for key in NUMERIC_COLUMNS:
+        if dialect == 'postgresql':
+            assignments.append(
+                f"{key} = CASE WHEN details->>'{key}' ~ '^-?[0-9]+(\\.[0-9]+)?$' "
+                f"THEN (details->>'{key}')::double precision END"
+            )
+        else:
+            assignments.append(
+                f"{key} = CAST(json_extract(details, '$.{key}') AS REAL)"
+            )
+    return assignments
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('footprints') as batch_op:
+        for column in CATEGORICAL_COLUMNS.values():
+            batch_op.add_column(sa.Column(column, sa.String(), nullable=True))
+        for column in NUMERIC_COLUMNS:
+            batch_op.add_column(sa.Column(column, sa.Float(), nullable=True))
+
+    dialect = op.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        op.execute(
+            "UPDATE footprints SET "
+            + ", ".join(_backfill_expressions(dialect))
+            + " WHERE details IS NOT NULL"
+        )
+
+    for column in INDEXED_COLUMNS:
+        op.create_index(f'ix_footprints_user_{column}', 'footprints', ['user_id', column], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in INDEXED_COLUMNS:
+        op.drop_index(f'ix_footprints_user_{column}', table_name='footprints')
+
+    with op.batch_alter_table('footprints') as batch_op:
+        for column in reversed(NUMERIC_COLUMNS):
+            batch_op.drop_column(column)
+        for column in reversed(list(CATEGORICAL_COLUMNS.values())):
+            batch_op.drop_column(column)
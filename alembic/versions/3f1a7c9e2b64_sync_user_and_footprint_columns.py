@@ -0,0 +1,79 @@
+"""Sync user and footprint columns with the models
+
+Revision ID: 3f1a7c9e2b64
+Revises: 5c2d8b0b72ba
+Create Date: 2026-10-18 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a7c9e2b64'
+down_revision: Union[str, Sequence[str], None] = '5c2d8b0b72ba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_columns(table: str) -> set:
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The app used to call create_all() on boot, so some databases already
+    # have these columns. Only add what is missing.
+    user_columns = _existing_columns('users')
+    with op.batch_alter_table('users') as batch_op:
+        if 'created_at' not in user_columns:
+            batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        if 'last_login_at' not in user_columns:
+            batch_op.add_column(sa.Column('last_login_at', sa.DateTime(), nullable=True))
+
+    footprint_columns = _existing_columns('footprints')
+    with op.batch_alter_table('footprints') as batch_op:
+        if 'details' not in footprint_columns:
+            batch_op.add_column(sa.Column('details', sa.JSON(), nullable=True))
+        if 'suggested_offsets' not in footprint_columns:
+            batch_op.add_column(sa.Column('suggested_offsets', sa.JSON(), nullable=True))
+        if 'created_at' not in footprint_columns:
+            batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        if 'entry_date' not in footprint_columns:
+            batch_op.add_column(
+                sa.Column(
+                    'entry_date',
+                    sa.DateTime(),
+                    nullable=False,
+                    server_default=sa.func.current_timestamp(),
+                )
+            )
+        if 'is_recurring' not in footprint_columns:
+            batch_op.add_column(sa.Column('is_recurring', sa.Boolean(), nullable=True))
+        if 'recurrence_frequency' not in footprint_columns:
+            batch_op.add_column(
+                sa.Column('recurrence_frequency', sa.String(), nullable=True)
+            )
+        if 'completed' in footprint_columns:
+            batch_op.drop_column('completed')
+        if 'completed_at' in footprint_columns:
+            batch_op.drop_column('completed_at')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('footprints') as batch_op:
+        batch_op.add_column(sa.Column('completed_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('completed', sa.Boolean(), nullable=True))
+        batch_op.drop_column('recurrence_frequency')
+        batch_op.drop_column('is_recurring')
+        batch_op.drop_column('entry_date')
+        batch_op.drop_column('created_at')
+        batch_op.drop_column('suggested_offsets')
+        batch_op.drop_column('details')
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('last_login_at')
+        batch_op.drop_column('created_at')
@@ -0,0 +1,46 @@
+"""Shard rank_sketches by user
+
+Revision ID: 4b7e1a9c6d23
+Revises: 5e9b7c2a4d16
+Create Date: 2026-10-19 15:08:52.470318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e1a9c6d23'
+down_revision: Union[str, Sequence[str], None] = '5e9b7c2a4d16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The sketches are derived data; recreate the table keyed by shard
+    op.drop_table('rank_sketches')
+    op.create_table('rank_sketches',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('activity_type', sa.String(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('sketch', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('month', 'activity_type', 'shard')
+    )
+    # Repopulate with:
+    #   python -m app.services.rollups
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rank_sketches')
+    op.create_table('rank_sketches',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('activity_type', sa.String(), nullable=False),
+    sa.Column('sketch', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('month', 'activity_type')
+    )
+    # Repopulate with:
+    #   python -m app.services.rollups
@@ -0,0 +1,30 @@
+"""Add deletion_jobs.heartbeat_at
+
+Revision ID: 5e9b7c2a4d16
+Revises: a6e4b2d9f170
+Create Date: 2026-10-19 09:41:26.115840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9b7c2a4d16'
+down_revision: Union[str, Sequence[str], None] = 'a6e4b2d9f170'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('deletion_jobs') as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('deletion_jobs') as batch_op:
+        batch_op.drop_column('heartbeat_at')
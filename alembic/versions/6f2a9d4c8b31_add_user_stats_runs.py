@@ -0,0 +1,32 @@
+"""Add user_stats.runs
+
+Revision ID: 6f2a9d4c8b31
+Revises: 8d3f6a2c1e95
+Create Date: 2026-10-20 14:37:05.662140
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2a9d4c8b31'
+down_revision: Union[str, Sequence[str], None] = '8d3f6a2c1e95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('user_stats') as batch_op:
+        batch_op.add_column(sa.Column('runs', sa.JSON(), nullable=True))
+    # Fill in with:
+    #   python -m app.services.stats
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('user_stats') as batch_op:
+        batch_op.drop_column('runs')
@@ -0,0 +1,140 @@
+"""Store activity/frequency as small-int codes and carbon as grams
+
+Revision ID: 7a9c3e1f5d48
+Revises: 1b6d0f4e8c29
+Create Date: 2026-10-18 15:08:12.660931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a9c3e1f5d48'
+down_revision: Union[str, Sequence[str], None] = '1b6d0f4e8c29'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Codes are the 1-based positions in app.services.carbon.ACTIVITY_TYPES and
+# RECURRENCE_FREQUENCIES at the time of this migration.
+ACTIVITY_TYPES = (
+    'flight', 'driving', 'train', 'tube', 'bus', 'meat', 'dairy',
+    'food_waste', 'clothing', 'electronics', 'online_shopping',
+    'electricity_use', 'gas_use', 'water_use', 'plastic_waste',
+    'general_waste', 'recycling', 'streaming', 'gaming', 'events',
+    'hotel_stays',
+)
+RECURRENCE_FREQUENCIES = ('daily', 'weekday', 'weekly', 'monthly')
+# recurrence_frequency used to be free text. Values are matched ignoring
+# case and surrounding spaces, plus these spellings; anything else is not a
+# frequency the recurrence code understands and becomes NULL.
+RECURRENCE_ALIASES = {'weekdays': 'weekday'}
+
+
+def _encode(column: str, names: tuple, aliases: dict = None) -> str:
+    codes = {name: code for code, name in enumerate(names, 1)}
+    codes.update({alias: codes[name] for alias, name in (aliases or {}).items()})
+    whens = " ".join(f"WHEN '{name}' THEN {code}" for name, code in codes.items())
+    return f"CASE {column} {whens} END"
+
+
+def _decode(column: str, names: tuple) -> str:
+    whens = " ".join(f"WHEN {code} THEN '{name}'" for code, name in enumerate(names, 1))
+    return f"CASE {column} {whens} END"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('footprints') as batch_op:
+        batch_op.add_column(sa.Column('activity_code', sa.SmallInteger(), nullable=True))
+        batch_op.add_column(sa.Column('recurrence_code', sa.SmallInteger(), nullable=True))
+        batch_op.add_column(sa.Column('carbon_g', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE footprints SET "
+        f"activity_code = {_encode('activity_type', ACTIVITY_TYPES)}, "
+        "recurrence_code = "
+        f"{_encode('LOWER(TRIM(recurrence_frequency))', RECURRENCE_FREQUENCIES, RECURRENCE_ALIASES)}, "
+        "carbon_g = CAST(ROUND(carbon_kg * 1000) AS INTEGER)"
+    )
+    with op.batch_alter_table('footprints') as batch_op:
+        batch_op.drop_column('activity_type')
+        batch_op.drop_column('recurrence_frequency')
+        batch_op.drop_column('carbon_kg')
+    with op.batch_alter_table('footprints') as batch_op:
+        batch_op.alter_column('activity_code', new_column_name='activity_type', existing_type=sa.SmallInteger(), nullable=False)
+        batch_op.alter_column('recurrence_code', new_column_name='recurrence_frequency', existing_type=sa.SmallInteger(), nullable=True)
+        batch_op.alter_column('carbon_g', existing_type=sa.Integer(), nullable=False)
+
+    with op.batch_alter_table('footprint_archive') as batch_op:
+        batch_op.add_column(sa.Column('activity_code', sa.SmallInteger(), nullable=True))
+        batch_op.add_column(sa.Column('carbon_g', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE footprint_archive SET "
+        f"activity_code = {_encode('activity_type', ACTIVITY_TYPES)}, "
+        "carbon_g = CAST(ROUND(carbon_kg * 1000) AS INTEGER)"
+    )
+    with op.batch_alter_table('footprint_archive') as batch_op:
+        batch_op.drop_column('activity_type')
+        batch_op.drop_column('carbon_kg')
+    with op.batch_alter_table('footprint_archive') as batch_op:
+        batch_op.alter_column('activity_code', new_column_name='activity_type', existing_type=sa.SmallInteger(), nullable=False)
+        batch_op.alter_column('carbon_g', existing_type=sa.Integer(), nullable=False)
+
+    # Keyed by activity_type including the "all" total, so only carbon changes
+    with op.batch_alter_table('user_monthly_totals') as batch_op:
+        batch_op.add_column(sa.Column('carbon_g', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE user_monthly_totals SET carbon_g = CAST(ROUND(carbon_kg * 1000) AS INTEGER)"
+    )
+    with op.batch_alter_table('user_monthly_totals') as batch_op:
+        batch_op.drop_column('carbon_kg')
+    with op.batch_alter_table('user_monthly_totals') as batch_op:
+        batch_op.alter_column('carbon_g', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('user_monthly_totals') as batch_op:
+        batch_op.add_column(sa.Column('carbon_kg', sa.Float(), nullable=True))
+    op.execute("UPDATE user_monthly_totals SET carbon_kg = carbon_g / 1000.0")
+    with op.batch_alter_table('user_monthly_totals') as batch_op:
+        batch_op.drop_column('carbon_g')
+    with op.batch_alter_table('user_monthly_totals') as batch_op:
+        batch_op.alter_column('carbon_kg', existing_type=sa.Float(), nullable=False)
+
+    with op.batch_alter_table('footprint_archive') as batch_op:
+        batch_op.add_column(sa.Column('activity_name', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('carbon_kg', sa.Float(), nullable=True))
+    op.execute(
+        "UPDATE footprint_archive SET "
+        f"activity_name = {_decode('activity_type', ACTIVITY_TYPES)}, "
+        "carbon_kg = carbon_g / 1000.0"
+    )
+    with op.batch_alter_table('footprint_archive') as batch_op:
+        batch_op.drop_column('activity_type')
+        batch_op.drop_column('carbon_g')
+    with op.batch_alter_table('footprint_archive') as batch_op:
+        batch_op.alter_column('activity_name', new_column_name='activity_type', existing_type=sa.String(), nullable=False)
+        batch_op.alter_column('carbon_kg', existing_type=sa.Float(), nullable=False)
+
+    with op.batch_alter_table('footprints') as batch_op:
+        batch_op.add_column(sa.Column('activity_name', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('recurrence_name', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('carbon_kg', sa.Float(), nullable=True))
+    op.execute(
+        "UPDATE footprints SET "
+        f"activity_name = {_decode('activity_type', ACTIVITY_TYPES)}, "
+        f"recurrence_name = {_decode('recurrence_frequency', RECURRENCE_FREQUENCIES)}, "
+        "carbon_kg = carbon_g / 1000.0"
+    )
+    with op.batch_alter_table('footprints') as batch_op:
+        batch_op.drop_column('activity_type')
+        batch_op.drop_column('recurrence_frequency')
+        batch_op.drop_column('carbon_g')
+    with op.batch_alter_table('footprints') as batch_op:
+        batch_op.alter_column('activity_name', new_column_name='activity_type', existing_type=sa.String(), nullable=False)
+        batch_op.alter_column('recurrence_name', new_column_name='recurrence_frequency', existing_type=sa.String(), nullable=True)
+        batch_op.alter_column('carbon_kg', existing_type=sa.Float(), nullable=False)
@@ -20,6 +20,13 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
+    # The app used to call create_all() on boot instead of migrating, so
+    # such databases already have these tables (with no alembic_version).
+    # Leave them be; 3f1a7c9e2b64 brings their columns up to date.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if {'users', 'footprints'} <= existing:
+        return
+
     # ### commands auto generated by Alembic - please adjust! ###
     op.create_table('users',
     sa.Column('id', sa.Integer(), nullable=False),
@@ -0,0 +1,48 @@
+"""Shard the global data version
+
+Revision ID: 8d3f6a2c1e95
+Revises: 4b7e1a9c6d23
+Create Date: 2026-10-20 10:12:44.309518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f6a2c1e95'
+down_revision: Union[str, Sequence[str], None] = '4b7e1a9c6d23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# versions.GLOBAL_SHARDS
+GLOBAL_SHARDS = 16
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The existing "global" count stays as the base the shards add to
+    data_versions = sa.table(
+        'data_versions', sa.column('scope', sa.String), sa.column('version', sa.Integer)
+    )
+    op.bulk_insert(
+        data_versions,
+        [{'scope': f'global:{shard}', 'version': 0} for shard in range(GLOBAL_SHARDS)],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Fold the shards back in, so the version never goes backwards
+    op.execute(
+        "INSERT INTO data_versions (scope, version) SELECT 'global', 0 "
+        "WHERE NOT EXISTS (SELECT 1 FROM data_versions WHERE scope = 'global')"
+    )
+    op.execute(
+        "UPDATE data_versions SET version = version + ("
+        "SELECT COALESCE(SUM(version), 0) FROM data_versions "
+        "WHERE scope LIKE 'global:%') WHERE scope = 'global'"
+    )
+    op.execute("DELETE FROM data_versions WHERE scope LIKE 'global:%'")
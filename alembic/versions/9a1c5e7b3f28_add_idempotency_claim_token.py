@@ -0,0 +1,30 @@
+"""Add idempotency_keys.claim_token
+
+Revision ID: 9a1c5e7b3f28
+Revises: 6f2a9d4c8b31
+Create Date: 2026-10-20 16:52:19.480233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a1c5e7b3f28'
+down_revision: Union[str, Sequence[str], None] = '6f2a9d4c8b31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.add_column(sa.Column('claim_token', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.drop_column('claim_token')
@@ -0,0 +1,127 @@
+"""Partition footprints by month and add footprint_archive
+
+Revision ID: 9d4e2a7b1c05
+Revises: 3f1a7c9e2b64
+Create Date: 2026-10-18 10:03:47.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e2a7b1c05'
+down_revision: Union[str, Sequence[str], None] = '3f1a7c9e2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Monthly partitions from the oldest stored row up to a year ahead, since
+# recurring entries are written up to 365 days into the future. Anything
+# outside that lands in footprints_default until the archive job creates
+# the partition.
+CREATE_MONTHLY_PARTITIONS = """
+DO $$
+DECLARE
+    m date;
+    last_month date;
+BEGIN
+    SELECT date_trunc('month', coalesce(min(entry_date), now()))::date
+      INTO m FROM footprints_unpartitioned;
+    last_month := (date_trunc('month', now()) + interval '13 months')::date;
+    WHILE m < last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF footprints FOR VALUES FROM (%L) TO (%L)',
+            'footprints_p' || to_char(m, 'YYYYMM'),
+            m,
+            (m + interval '1 month')::date
+        );
+        m := (m + interval '1 month')::date;
+    END LOOP;
+END $$;
+"""
+
+
+def _partition_footprints() -> None:
+    op.execute("ALTER TABLE footprints RENAME TO footprints_unpartitioned")
+    op.execute(
+        "ALTER TABLE footprints_unpartitioned "
+        "RENAME CONSTRAINT footprints_pkey TO footprints_unpartitioned_pkey"
+    )
+    op.execute("ALTER INDEX ix_footprints_id RENAME TO ix_footprints_unpartitioned_id")
+    op.execute(
+        "CREATE TABLE footprints (LIKE footprints_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (entry_date)"
+    )
+    # The partition key has to be part of the primary key.
+    op.execute("ALTER TABLE footprints ADD PRIMARY KEY (id, entry_date)")
+    op.execute(
+        "ALTER TABLE footprints ADD FOREIGN KEY (user_id) REFERENCES users (id)"
+    )
+    op.execute("CREATE INDEX ix_footprints_id ON footprints (id)")
+    op.execute(
+        "CREATE INDEX ix_footprints_user_entry_date ON footprints (user_id, entry_date)"
+    )
+    op.execute("CREATE TABLE footprints_default PARTITION OF footprints DEFAULT")
+    op.execute(CREATE_MONTHLY_PARTITIONS)
+    op.execute("INSERT INTO footprints SELECT * FROM footprints_unpartitioned")
+    op.execute("ALTER SEQUENCE footprints_id_seq OWNED BY footprints.id")
+    op.execute("DROP TABLE footprints_unpartitioned")
+
+
+def _unpartition_footprints() -> None:
+    op.execute("ALTER TABLE footprints RENAME TO footprints_partitioned")
+    op.execute("ALTER INDEX ix_footprints_id RENAME TO ix_footprints_partitioned_id")
+    op.execute(
+        "ALTER TABLE footprints_partitioned "
+        "RENAME CONSTRAINT footprints_pkey TO footprints_partitioned_pkey"
+    )
+    op.execute(
+        "CREATE TABLE footprints (LIKE footprints_partitioned INCLUDING DEFAULTS)"
+    )
+    op.execute("ALTER TABLE footprints ADD PRIMARY KEY (id)")
+    op.execute(
+        "ALTER TABLE footprints ADD FOREIGN KEY (user_id) REFERENCES users (id)"
+    )
+    op.execute("CREATE INDEX ix_footprints_id ON footprints (id)")
+    op.execute("INSERT INTO footprints SELECT * FROM footprints_partitioned")
+    op.execute("ALTER SEQUENCE footprints_id_seq OWNED BY footprints.id")
+    op.execute("DROP TABLE footprints_partitioned CASCADE")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('footprint_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('activity_type', sa.String(), nullable=False),
+    sa.Column('entry_date', sa.Date(), nullable=False),
+    sa.Column('created_date', sa.Date(), nullable=True),
+    sa.Column('carbon_kg', sa.Float(), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_footprint_archive_id'), 'footprint_archive', ['id'], unique=False)
+    op.create_index(op.f('ix_footprint_archive_user_id'), 'footprint_archive', ['user_id'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_footprints()
+    else:
+        # SQLite has no native partitioning; the (user_id, entry_date) index
+        # gives the same range pruning for per-user queries.
+        op.create_index('ix_footprints_user_entry_date', 'footprints', ['user_id', 'entry_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        _unpartition_footprints()
+    else:
+        op.drop_index('ix_footprints_user_entry_date', table_name='footprints')
+
+    op.drop_index(op.f('ix_footprint_archive_user_id'), table_name='footprint_archive')
+    op.drop_index(op.f('ix_footprint_archive_id'), table_name='footprint_archive')
+    op.drop_table('footprint_archive')
@@ -0,0 +1,38 @@
+"""Add user_stats
+
+Revision ID: a6e4b2d9f170
+Revises: f3c8a1d6b925
+Create Date: 2026-10-18 19:02:17.804316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e4b2d9f170'
+down_revision: Union[str, Sequence[str], None] = 'f3c8a1d6b925'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('carbon_g', sa.Integer(), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.Column('activity_totals', sa.JSON(), nullable=False),
+    sa.Column('last_entry_date', sa.Date(), nullable=True),
+    sa.Column('streak_start', sa.Date(), nullable=True),
+    sa.Column('streak_days', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_stats')
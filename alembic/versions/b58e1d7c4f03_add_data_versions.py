@@ -0,0 +1,33 @@
+"""Add data_versions
+
+Revision ID: b58e1d7c4f03
+Revises: 7a9c3e1f5d48
+Create Date: 2026-10-18 16:21:38.045127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b58e1d7c4f03'
+down_revision: Union[str, Sequence[str], None] = '7a9c3e1f5d48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('data_versions',
+    sa.Column('scope', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('scope')
+    )
+    op.execute("INSERT INTO data_versions (scope, version) VALUES ('global', 0)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('data_versions')
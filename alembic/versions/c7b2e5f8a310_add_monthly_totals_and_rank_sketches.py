@@ -0,0 +1,45 @@
+"""Add user_monthly_totals and rank_sketches
+
+Revision ID: c7b2e5f8a310
+Revises: 9d4e2a7b1c05
+Create Date: 2026-10-18 11:27:05.934410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7b2e5f8a310'
+down_revision: Union[str, Sequence[str], None] = '9d4e2a7b1c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_monthly_totals',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('activity_type', sa.String(), nullable=False),
+    sa.Column('carbon_kg', sa.Float(), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'month', 'activity_type')
+    )
+    op.create_table('rank_sketches',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('activity_type', sa.String(), nullable=False),
+    sa.Column('sketch', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('month', 'activity_type')
+    )
+    # Populate both from existing footprints with:
+    #   python -m app.services.rollups
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rank_sketches')
+    op.drop_table('user_monthly_totals')
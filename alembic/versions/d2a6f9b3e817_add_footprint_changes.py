@@ -0,0 +1,40 @@
+"""Add footprint_changes
+
+Revision ID: d2a6f9b3e817
+Revises: b58e1d7c4f03
+Create Date: 2026-10-18 17:05:51.329864
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a6f9b3e817'
+down_revision: Union[str, Sequence[str], None] = 'b58e1d7c4f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('footprint_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('footprint_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_footprint_changes_id'), 'footprint_changes', ['id'], unique=False)
+    op.create_index('ix_footprint_changes_user_id_id', 'footprint_changes', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_footprint_changes_user_id_id', table_name='footprint_changes')
+    op.drop_index(op.f('ix_footprint_changes_id'), table_name='footprint_changes')
+    op.drop_table('footprint_changes')
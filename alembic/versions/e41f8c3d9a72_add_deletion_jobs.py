@@ -0,0 +1,45 @@
+"""Add deletion_jobs
+
+Revision ID: e41f8c3d9a72
+Revises: c7b2e5f8a310
+Create Date: 2026-10-18 12:40:19.551873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41f8c3d9a72'
+down_revision: Union[str, Sequence[str], None] = 'c7b2e5f8a310'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('deletion_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('activity_type', sa.String(), nullable=True),
+    sa.Column('start', sa.DateTime(), nullable=True),
+    sa.Column('end', sa.DateTime(), nullable=True),
+    sa.Column('deleted_count', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_deletion_jobs_id'), 'deletion_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_deletion_jobs_user_id'), 'deletion_jobs', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_deletion_jobs_user_id'), table_name='deletion_jobs')
+    op.drop_index(op.f('ix_deletion_jobs_id'), table_name='deletion_jobs')
+    op.drop_table('deletion_jobs')
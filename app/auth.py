@@ -1,10 +1,16 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from .database import get_db
+from .database import (
+    LAST_WRITE_COOKIE,
+    LAST_WRITE_HEADER,
+    get_db,
+    parse_write_marker,
+    read_session,
+)
 from . import models
 from dotenv import load_dotenv
 
@@ -70,3 +76,27 @@ def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
         )
     return user
+
+
+def get_read_db(request: Request, token: str = Depends(oauth2_scheme)):
+    """
+    Session for read-only routes, served from a replica when one is fresh
+    enough and the user hasn't written recently.
+    """
+    try:
+        user_id = int(decode_access_token(token).get("sub"))
+    except (HTTPException, TypeError, ValueError):
+        user_id = None
+        last_write = None
+    else:
+        marker = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(
+            LAST_WRITE_COOKIE
+        )
+        last_write = parse_write_marker(marker, user_id)
+    yield from read_session(user_id, last_write)
+
+
+def get_current_reader(
+    token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)
+):
+    return get_current_user(token, db)
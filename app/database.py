@@ -1,15 +1,57 @@
-from sqlalchemy import create_engine
+import hashlib
+import hmac
+import itertools
+import math
+import os
+import threading
+import time
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+load_dotenv()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+POOL_WARM_CONNECTIONS = int(os.getenv("POOL_WARM_CONNECTIONS", 5))
+
+# Comma-separated read replica URLs. Locally a second SQLite file works.
+REPLICA_DATABASE_URLS = [
+    url.strip()
+    for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",")
+    if url.strip()
+]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", 1))
+# After a user writes, their reads stay on the primary for this long
+READ_YOUR_WRITES_SECONDS = float(
+    os.getenv("READ_YOUR_WRITES_SECONDS", REPLICA_MAX_LAG_SECONDS)
 )
 
+
+def make_engine(url: str):
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    return create_engine(url, connect_args=connect_args, pool_pre_ping=True)
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
+replica_engines = [make_engine(url) for url in REPLICA_DATABASE_URLS]
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Carries the time of a user's last write to whichever worker serves their
+# next read, signed so a client can't pin itself to the primary for others.
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+# Expired stickiness is swept once the map grows past this many users
+_SWEEP_AT = 1024
+
+_last_write_at = {}
+_replica_lag = {}
+_replica_cycle = itertools.count()
+_lock = threading.Lock()
+
 
 def get_db():
     db = SessionLocal()
@@ -17,3 +59,153 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def insert_ignore(db, model, **values):
+    """
+    INSERT a row unless one with the same key exists, without failing the
+    transaction when a concurrent writer created it first.
+    """
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    db.execute(insert(model).values(**values).on_conflict_do_nothing())
+
+
+def _sign(payload: str) -> str:
+    key = os.getenv("SECRET_KEY", "").encode()
+    return hmac.new(key, payload.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def write_marker(user_id: int, written_at: float) -> str:
+    payload = f"{user_id}.{written_at:.3f}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def parse_write_marker(marker: Optional[str], user_id: int) -> Optional[float]:
+    """
+    Write time carried by `marker`, if it is validly signed and for `user_id`.
+    """
+    if not marker:
+        return None
+    payload, _, signature = marker.rpartition(".")
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    marker_user, _, written_at = payload.partition(".")
+    try:
+        if int(marker_user) != user_id:
+            return None
+        return float(written_at)
+    except ValueError:
+        return None
+
+
+def note_write(user_id: int, response=None):
+    """
+    Pin the user's reads to the primary until replicas have caught up.
+    Stickiness is remembered in this process, and, given the `response`,
+    also handed to the client as a signed cookie and header so that the
+    next read is pinned whichever worker it lands on.
+    """
+    now = time.time()
+    with _lock:
+        _last_write_at[user_id] = now
+        if len(_last_write_at) > _SWEEP_AT:
+            for stale in [
+                uid
+                for uid, written_at in _last_write_at.items()
+                if now - written_at >= READ_YOUR_WRITES_SECONDS
+            ]:
+                del _last_write_at[stale]
+
+    if response is not None and os.getenv("SECRET_KEY"):
+        marker = write_marker(user_id, now)
+        response.headers[LAST_WRITE_HEADER] = marker
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            marker,
+            max_age=math.ceil(READ_YOUR_WRITES_SECONDS),
+            httponly=True,
+            secure=True,
+            samesite="none",
+        )
+
+
+def _measure_lag(replica) -> float:
+    if replica.dialect.name != "postgresql":
+        return 0.0
+    with replica.connect() as conn:
+        return float(
+            conn.execute(
+                text(
+                    "SELECT COALESCE(EXTRACT(EPOCH FROM "
+                    "now() - pg_last_xact_replay_timestamp()), 0)"
+                )
+            ).scalar()
+        )
+
+
+def replica_lag(replica) -> float:
+    """
+    Replication lag in seconds, re-measured at most every
+    REPLICA_LAG_CHECK_SECONDS. An unreachable replica counts as infinitely
+    behind.
+    """
+    now = time.monotonic()
+    checked_at, lag = _replica_lag.get(replica, (None, None))
+    if checked_at is None or now - checked_at > REPLICA_LAG_CHECK_SECONDS:
+        try:
+            lag = _measure_lag(replica)
+        except Exception:
+            lag = float("inf")
+        _replica_lag[replica] = (now, lag)
+    return lag
+
+
+def read_engine(user_id: Optional[int] = None, last_write: Optional[float] = None):
+    """
+    Pick the engine for a read-only request: a replica within the lag
+    tolerance, or the primary if there is none or the user wrote recently,
+    as recorded here or in the `last_write` time the client sent back.
+    """
+    if not replica_engines:
+        return engine
+
+    if user_id is not None:
+        with _lock:
+            local_write = _last_write_at.get(user_id)
+        last_write = max(filter(None, (local_write, last_write)), default=None)
+        if last_write and time.time() - last_write < READ_YOUR_WRITES_SECONDS:
+            return engine
+
+    start = next(_replica_cycle)
+    for offset in range(len(replica_engines)):
+        replica = replica_engines[(start + offset) % len(replica_engines)]
+        if replica_lag(replica) <= REPLICA_MAX_LAG_SECONDS:
+            return replica
+    return engine
+
+
+def read_session(user_id: Optional[int] = None, last_write: Optional[float] = None):
+    db = SessionLocal(bind=read_engine(user_id, last_write))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def warm_pool(connections: int = POOL_WARM_CONNECTIONS):
+    """
+    Open pool connections up front so the first requests don't pay the connect cost.
+    """
+    opened = []
+    try:
+        for target in [engine, *replica_engines]:
+            for _ in range(connections):
+                conn = target.connect()
+                conn.execute(text("SELECT 1"))
+                opened.append(conn)
+    finally:
+        for conn in opened:
+            conn.close()
@@ -1,12 +1,57 @@
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import requests
-import os
-from . import models
-from .database import engine
+from fastapi.responses import JSONResponse
+from .database import SessionLocal, warm_pool
 from .routes import users, footprints
+from .services.carbon import prime_factor_engine
+from .services import deletion, ingest
+from .services.singleflight import aggregates
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(app: FastAPI) -> bool:
+    """
+    Pre-open pool connections and prime the factor engine and hot queries.
+    Schema changes are left to Alembic; nothing here creates tables.
+    """
+    try:
+        warm_pool()
+        prime_factor_engine()
+        db = SessionLocal()
+        try:
+            footprints.warm_queries(db)
+            # Jobs whose worker died before this one started will never finish
+            deletion.fail_abandoned_jobs(db)
+        finally:
+            db.close()
+    except Exception as e:
+        app.state.ready = False
+        app.state.startup_error = str(e)
+        logger.warning("Warm-up failed: %s", e)
+        return False
+
+    app.state.ready = True
+    app.state.startup_error = None
+    return True
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up(app)
+    app.state.startup_seconds = round(time.perf_counter() - IMPORT_STARTED, 3)
+    logger.info("Import to ready: %.3fs", app.state.startup_seconds)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,14 +59,14 @@ app.add_middleware(
         "https://carbon-calculator-fe-pi.vercel.app",
         "https://carbon-calculator-fe-pi.vercel.app/",
         "http://localhost:3000"
-    ], 
+    ],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Response headers the frontend reads; browsers hide the rest
+    expose_headers=["X-Change-Cursor", "X-Last-Write", "ETag", "Idempotent-Replayed"],
 )
 
-models.Base.metadata.create_all(bind=engine)
-
 app.include_router(users.router, tags=["users"])
 app.include_router(footprints.router, tags=["footprints"])
 
@@ -29,8 +74,35 @@ app.include_router(footprints.router, tags=["footprints"])
 def root():
     return {"message": "Backend running"}
 
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    # A worker that came up before the database did retries here rather than
+    # staying out of rotation until it is restarted.
+    if not getattr(app.state, "ready", False) and not warm_up(app):
+        return JSONResponse(
+            status_code=503,
+            content={"status": "starting", "detail": app.state.startup_error},
+        )
+    return {
+        "status": "ready",
+        "startup_seconds": getattr(app.state, "startup_seconds", None),
+    }
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "coalesced_queries": aggregates.stats(),
+        "group_commit": ingest.writer.stats(),
+    }
+
 @app.get("/api/news")
 def get_news():
+    import requests
+
     api_key = os.getenv("NEWS_API_KEY")
     url = (
         f"https://newsapi.org/v2/everything?q=%2B%22climate%20change%22%20OR%20"
@@ -38,4 +110,4 @@ def get_news():
         f"searchIn=title&language=en&sortBy=relevancy&pageSize=8&apiKey={api_key}"
     )
     response = requests.get(url)
-    return response.json()
\ No newline at end of file
+    return response.json()
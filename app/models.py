@@ -1,8 +1,98 @@
 from datetime import datetime
-from sqlalchemy import Boolean, Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    SmallInteger,
+    String,
+)
 from sqlalchemy.dialects.postgresql import JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy.types import TypeDecorator
 from .database import Base
+from .services.carbon import ACTIVITY_TYPES, RECURRENCE_FREQUENCIES
+
+# Every details key calculate_carbon reads, mapped to the typed column it is
+# projected into. "type" is stored as item_type.
+CATEGORICAL_DETAIL_COLUMNS = {
+    "flight_type": "flight_type",
+    "commute": "commute",
+    "fuel_type": "fuel_type",
+    "type": "item_type",
+    "frequency": "frequency",
+}
+NUMERIC_DETAIL_COLUMNS = {
+    "servings_per_week": "servings_per_week",
+    "orders_per_month": "orders_per_month",
+    "returns_per_month": "returns_per_month",
+    "kwh_per_month": "kwh_per_month",
+    "litres_per_day": "litres_per_day",
+    "bags_per_week": "bags_per_week",
+    "kg_per_week": "kg_per_week",
+    "percent": "percent",
+    "hours_per_week": "hours_per_week",
+    "per_year": "per_year",
+    "nights_per_year": "nights_per_year",
+}
+DETAIL_COLUMNS = {**CATEGORICAL_DETAIL_COLUMNS, **NUMERIC_DETAIL_COLUMNS}
+
+
+class CodedString(TypeDecorator):
+    """
+    A string from a fixed vocabulary, stored as its 1-based position.
+    """
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self._codes = {name: code for code, name in enumerate(self.names, start=1)}
+        super().__init__()
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            return self._codes[value]
+        except KeyError:
+            raise ValueError(f"Unknown value: {value}")
+
+    def process_result_value(self, value, dialect):
+        if value is None or not 0 < value <= len(self.names):
+            return None
+        return self.names[value - 1]
+
+
+class CarbonGrams(TypeDecorator):
+    """
+    Kilograms in Python, whole grams in the database, so sums are exact.
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return int(round(value * 1000))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return float(value) / 1000
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
 
 
 class User(Base):
@@ -22,8 +112,8 @@ class Footprint(Base):
     __tablename__ = "footprints"
 
     id = Column(Integer, primary_key=True, index=True)
-    activity_type = Column(String, nullable=False)
-    carbon_kg = Column(Float, nullable=False)
+    activity_type = Column(CodedString(ACTIVITY_TYPES), nullable=False)
+    carbon_kg = Column("carbon_g", CarbonGrams, nullable=False)
     details = Column(JSON, nullable=True)
     suggested_offsets = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -31,7 +121,192 @@ class Footprint(Base):
 
     # RECURRING FIELDS
     is_recurring = Column(Boolean, default=False)
-    recurrence_frequency = Column(String, nullable=True)
+    recurrence_frequency = Column(CodedString(RECURRENCE_FREQUENCIES), nullable=True)
 
     user_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("User", back_populates="footprints")
+
+    # TYPED DETAIL FIELDS, kept in sync with `details` on assignment
+    flight_type = Column(String, nullable=True)
+    commute = Column(String, nullable=True)
+    fuel_type = Column(String, nullable=True)
+    item_type = Column(String, nullable=True)
+    frequency = Column(String, nullable=True)
+    servings_per_week = Column(Float, nullable=True)
+    orders_per_month = Column(Float, nullable=True)
+    returns_per_month = Column(Float, nullable=True)
+    kwh_per_month = Column(Float, nullable=True)
+    litres_per_day = Column(Float, nullable=True)
+    bags_per_week = Column(Float, nullable=True)
+    kg_per_week = Column(Float, nullable=True)
+    percent = Column(Float, nullable=True)
+    hours_per_week = Column(Float, nullable=True)
+    per_year = Column(Float, nullable=True)
+    nights_per_year = Column(Float, nullable=True)
+
+    # On Postgres the table is range-partitioned by month on entry_date (see
+    # the partitioning migration), so date-bounded queries only touch the
+    # months they need.
+    __table_args__ = (
+        Index("ix_footprints_user_entry_date", "user_id", "entry_date"),
+        Index("ix_footprints_user_fuel_type", "user_id", "fuel_type"),
+        Index("ix_footprints_user_commute", "user_id", "commute"),
+        Index("ix_footprints_user_item_type", "user_id", "item_type"),
+    )
+
+    @validates("details")
+    def _project_details(self, key, details):
+        values = details if isinstance(details, dict) else {}
+        for detail_key, column in CATEGORICAL_DETAIL_COLUMNS.items():
+            value = values.get(detail_key)
+            setattr(self, column, None if value is None else str(value))
+        for detail_key, column in NUMERIC_DETAIL_COLUMNS.items():
+            setattr(self, column, _as_float(values.get(detail_key)))
+        return details
+
+
+def details_from_columns(row) -> dict:
+    """
+    Rebuild the details calculate_carbon needs from the typed columns of a
+    Footprint (or any row selecting those columns).
+    """
+    details = {}
+    for detail_key, column in DETAIL_COLUMNS.items():
+        value = getattr(row, column)
+        if value is not None:
+            details[detail_key] = value
+    return details
+
+
+class FootprintArchive(Base):
+    """
+    Compact daily totals for footprints from closed periods. Raw rows for a
+    month are folded in here by the archive job and then removed.
+    """
+
+    __tablename__ = "footprint_archive"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    activity_type = Column(CodedString(ACTIVITY_TYPES), nullable=False)
+    entry_date = Column(Date, nullable=False)
+    created_date = Column(Date, nullable=True)
+    carbon_kg = Column("carbon_g", CarbonGrams, nullable=False)
+    entry_count = Column(Integer, nullable=False, default=0)
+
+
+class UserMonthlyTotal(Base):
+    """
+    Running carbon total per user, month and activity. activity_type "all"
+    holds the user's overall total for the month.
+    """
+
+    __tablename__ = "user_monthly_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(Date, primary_key=True)
+    activity_type = Column(String, primary_key=True)
+    carbon_kg = Column("carbon_g", CarbonGrams, nullable=False, default=0.0)
+    entry_count = Column(Integer, nullable=False, default=0)
+
+
+class UserStats(Base):
+    """
+    Lifetime stats per user, kept up to date in the same transaction as
+    footprint writes. activity_totals maps activity_type to lifetime kg.
+    The streak is the run of consecutive entry days ending at
+    last_entry_date, starting at streak_start. runs lists [first, last]
+    day pairs, newest first, of every run that could still become the
+    current streak: those starting after the day of the last write, and
+    the newest one starting on or before it.
+    """
+
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    carbon_kg = Column("carbon_g", CarbonGrams, nullable=False, default=0.0)
+    entry_count = Column(Integer, nullable=False, default=0)
+    activity_totals = Column(JSON, nullable=False, default=dict)
+    last_entry_date = Column(Date, nullable=True)
+    streak_start = Column(Date, nullable=True)
+    streak_days = Column(Integer, nullable=False, default=0)
+    runs = Column(JSON, nullable=True)
+
+
+class RankSketch(Base):
+    """
+    Quantile sketch of every user's monthly total, per month and activity,
+    split into shards by user id so that concurrent writes for different
+    users rarely wait on the same row. Readers merge the shards.
+    """
+
+    __tablename__ = "rank_sketches"
+
+    month = Column(Date, primary_key=True)
+    activity_type = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    sketch = Column(JSON, nullable=False)
+
+
+class DeletionJob(Base):
+    __tablename__ = "deletion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String, nullable=False, default="pending")
+    activity_type = Column(String, nullable=True)
+    start = Column(DateTime, nullable=True)
+    end = Column(DateTime, nullable=True)
+    deleted_count = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class DataVersion(Base):
+    """
+    Counter bumped on every footprint write, per user ("user:<id>") and
+    overall. The overall version is the sum of the "global:<n>" counters;
+    see services/versions.py. Used to answer conditional GETs without a query.
+    """
+
+    __tablename__ = "data_versions"
+
+    scope = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class FootprintChange(Base):
+    """
+    Append-only log of footprint upserts and deletes. The id is the
+    monotonic cursor clients sync from.
+    """
+
+    __tablename__ = "footprint_changes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    footprint_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_footprint_changes_user_id_id", "user_id", "id"),)
+
+
+class IdempotencyKey(Base):
+    """
+    Outcome of a write made with an Idempotency-Key header, so retries get
+    the original response back. Only a hash of the key and request is kept.
+    A row without a response is still in progress; expired rows are purged.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key_hash = Column(String(64), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    claim_token = Column(String(32), nullable=True)
+    status_code = Column(SmallInteger, nullable=True)
+    response = Column(JSON, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,12 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import func, union_all
+from typing import List, Optional
 from datetime import datetime
 from datetime import timedelta
+from collections import defaultdict
 from .. import models, schemas, auth
-from ..database import get_db
-from ..services.carbon import calculate_carbon, suggest_offsets
+from ..database import get_db, note_write
+from ..services import (
+    changes,
+    deletion,
+    idempotency,
+    ingest,
+    rollups,
+    scenarios,
+    versions,
+)
+from ..services.partitions import in_date_range
+from ..services.carbon import VALID_ACTIVITIES, calculate_carbon, suggest_offsets
+from ..services.singleflight import aggregates
+from ..services.sketch import QuantileSketch, RELATIVE_ERROR
 
 router = APIRouter(prefix="/footprints", tags=["Footprints"])
 
@@ -17,18 +39,126 @@ def get_current_user(
     return auth.get_current_user(token, db)
 
 
+def user_footprints_query(
+    db: Session,
+    user_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    **filters,
+):
+    query = db.query(models.Footprint).filter(models.Footprint.user_id == user_id)
+    # Filters hit the typed detail columns, never the details JSON
+    query = query.filter_by(**{k: v for k, v in filters.items() if v is not None})
+    return in_date_range(query, models.Footprint.entry_date, start, end)
+
+
+def warm_queries(db: Session):
+    """
+    Run the hot per-request queries once so their compiled SQL is cached on the
+    engine before real traffic arrives.
+    """
+    db.query(models.User).filter(models.User.id == 0).first()
+    user_footprints_query(db, 0).all()
+
+
 @router.get("/self", response_model=List[schemas.FootprintResponse])
 def get_user_footprints(
-    db: Session = Depends(get_db), user: models.User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    activity_type: Optional[str] = None,
+    fuel_type: Optional[str] = None,
+    commute: Optional[str] = None,
+    flight_type: Optional[str] = None,
+    item_type: Optional[str] = Query(None, alias="type"),
+    frequency: Optional[str] = None,
+    db: Session = Depends(auth.get_read_db),
+    user: models.User = Depends(auth.get_current_reader),
+):
+    # Unknown names have no code to filter on
+    if activity_type is not None and activity_type not in VALID_ACTIVITIES:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid activity_type: {activity_type}"
+        )
+
+    scope = versions.user_scope(user.id)
+    tag = versions.etag(scope, versions.current(db, scope), request)
+    not_modified = versions.not_modified(request, response, tag)
+    if not_modified:
+        return not_modified
+
+    # Read before the rows so a client syncing from here can't miss a change
+    response.headers["X-Change-Cursor"] = str(changes.latest_cursor(db, user.id))
+    return user_footprints_query(
+        db,
+        user.id,
+        start,
+        end,
+        activity_type=activity_type,
+        fuel_type=fuel_type,
+        commute=commute,
+        flight_type=flight_type,
+        item_type=item_type,
+        frequency=frequency,
+    ).all()
+
+
+@router.get("/changes", response_model=schemas.FootprintChangesResponse)
+def get_footprint_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    db: Session = Depends(auth.get_read_db),
+    user: models.User = Depends(auth.get_current_reader),
 ):
-    return db.query(models.Footprint).filter(models.Footprint.user_id == user.id).all()
+    # The user's changes below their watermark may be gone, so neither an
+    # old cursor nor a fresh client starting from 0 can be answered
+    if since < changes.pruned_through(db, user.id):
+        raise HTTPException(
+            status_code=410, detail="Cursor expired, resync from /footprints/self"
+        )
+
+    page = (
+        db.query(models.FootprintChange)
+        .filter(
+            models.FootprintChange.user_id == user.id,
+            models.FootprintChange.id > since,
+        )
+        .order_by(models.FootprintChange.id)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    # Only the last change per footprint in this page matters
+    latest_op = {change.footprint_id: change.op for change in page}
+    upsert_ids = [id_ for id_, op in latest_op.items() if op == changes.UPSERT]
+    upserts = (
+        db.query(models.Footprint)
+        .filter(
+            models.Footprint.user_id == user.id, models.Footprint.id.in_(upsert_ids)
+        )
+        .all()
+        if upsert_ids
+        else []
+    )
+
+    return {
+        "cursor": page[-1].id if page else since,
+        "has_more": has_more,
+        "upserts": upserts,
+        "deletes": [id_ for id_, op in latest_op.items() if op == changes.DELETE],
+    }
 
 
 @router.post("/", response_model=schemas.FootprintResponse)
 def create_footprint(
     footprint: schemas.FootprintCreate,
+    response: Response,
     db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
 ):
     carbon_kg = calculate_carbon(footprint.activity_type, footprint.details)
     offsets = suggest_offsets(carbon_kg)
@@ -43,7 +173,21 @@ def create_footprint(
         recurrence_frequency=footprint.recurrence_frequency,
         suggested_offsets=offsets,
     )
-    db.add(first_footprint)
+
+    # Keyed writes have to commit their stored response with the rows
+    if (
+        ingest.GROUP_COMMIT_ENABLED
+        and not footprint.is_recurring
+        and idempotency_key is None
+    ):
+        try:
+            stored = ingest.writer.write(first_footprint)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {e}")
+        note_write(user.id, response)
+        return stored
+
+    created = [first_footprint]
 
     if footprint.is_recurring:
         start_date = footprint.entry_date
@@ -89,14 +233,32 @@ def create_footprint(
                     recurrence_frequency=footprint.recurrence_frequency,
                     suggested_offsets=offsets,
                 )
-                db.add(future_footprint)
+                created.append(future_footprint)
                 entries_count += 1
 
+    # Claim only once the request is known to be valid, so a rejected
+    # request never leaves a key in progress
+    claim = idempotency.claim(
+        db, user.id, idempotency_key, "POST /footprints/", footprint
+    )
+    if claim.replay is not None:
+        return claim.replay
+
     try:
+        db.add_all(created)
+        rollups.record_added(db, user.id, created)
+        idempotency.complete(
+            db, claim, schemas.FootprintResponse.model_validate(first_footprint)
+        )
         db.commit()
+        note_write(user.id, response)
         db.refresh(first_footprint)
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
+        idempotency.release(db, claim)
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
     return first_footprint
@@ -105,78 +267,243 @@ def create_footprint(
 @router.post("/bulk", response_model=List[schemas.FootprintResponse])
 def create_multiple_footprints(
     footprints: List[schemas.FootprintCreate],
+    response: Response,
     db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
 ):
     if not footprints:
         raise HTTPException(status_code=400, detail="No footprints provided")
 
-    db_objects = []
+    db_objects = [
+        models.Footprint(
+            activity_type=footprint.activity_type,
+            carbon_kg=calculate_carbon(footprint.activity_type, footprint.details),
+            user_id=user.id,
+            details=footprint.details,
+            entry_date=footprint.entry_date,
+        )
+        for footprint in footprints
+    ]
+
+    claim = idempotency.claim(
+        db, user.id, idempotency_key, "POST /footprints/bulk", footprints
+    )
+    if claim.replay is not None:
+        return claim.replay
+
     try:
-        for footprint in footprints:
-            carbon_kg = calculate_carbon(footprint.activity_type, footprint.details)
-            db_footprint = models.Footprint(
-                activity_type=footprint.activity_type,
-                carbon_kg=carbon_kg,
-                user_id=user.id,
-            )
-            db.add(db_footprint)
-            db_objects.append(db_footprint)
+        db.add_all(db_objects)
+        rollups.record_added(db, user.id, db_objects)
+        idempotency.complete(
+            db,
+            claim,
+            [schemas.FootprintResponse.model_validate(obj) for obj in db_objects],
+        )
         db.commit()
+        note_write(user.id, response)
         for obj in db_objects:
             db.refresh(obj)
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
+        idempotency.release(db, claim)
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
     return db_objects
 
 
-@router.delete("/bulk", response_model=dict)
+@router.delete("/bulk", response_model=dict, status_code=202)
 def bulk_delete_footprints(
-    db: Session = Depends(get_db), user: models.User = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    activity_type: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_current_user),
 ):
-    deleted_count = (
-        db.query(models.Footprint)
-        .filter(models.Footprint.user_id == user.id)
-        .delete(synchronize_session=False)
+    if activity_type is not None and activity_type not in VALID_ACTIVITIES:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid activity_type: {activity_type}"
+        )
+
+    job = models.DeletionJob(
+        user_id=user.id,
+        status="pending",
+        activity_type=activity_type,
+        start=start,
+        end=end,
     )
+    db.add(job)
     db.commit()
-    return {"detail": f"Deleted {deleted_count} footprints for user {user.username}"}
+    db.refresh(job)
 
+    background_tasks.add_task(deletion.run_deletion_job, job.id)
+    return {
+        "detail": f"Deleting footprints for user {user.username}",
+        "job_id": job.id,
+    }
 
-@router.get("/all", response_model=List[schemas.FootprintAverageResponse])
-def get_all_footprints(
-    db: Session = Depends(get_db), user: models.User = Depends(get_current_user)
+
+@router.get("/jobs/{job_id}", response_model=schemas.DeletionJobResponse)
+def get_deletion_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_current_user),
 ):
+    job = db.query(models.DeletionJob).filter_by(id=job_id, user_id=user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def daily_averages(db: Session, start: Optional[datetime], end: Optional[datetime]):
+    """
+    Average per-user daily total for each entry day in the range. Grouped by
+    entry_date, the same column the range filters on.
+    """
+    live_rows = in_date_range(
+        db.query(
+            models.Footprint.user_id.label("user_id"),
+            func.date(models.Footprint.entry_date).label("entry_day"),
+            models.Footprint.carbon_kg.label("carbon_kg"),
+        ),
+        models.Footprint.entry_date,
+        start,
+        end,
+    )
+    # Closed periods live on as daily totals in the archive.
+    archived_rows = in_date_range(
+        db.query(
+            models.FootprintArchive.user_id.label("user_id"),
+            func.date(models.FootprintArchive.entry_date).label("entry_day"),
+            models.FootprintArchive.carbon_kg.label("carbon_kg"),
+        ),
+        models.FootprintArchive.entry_date,
+        start.date() if start else None,
+        end.date() if end else None,
+    )
+    all_rows = union_all(live_rows.statement, archived_rows.statement).subquery()
+
     daily_user_totals = (
         db.query(
-            models.Footprint.user_id,
-            func.date(models.Footprint.created_at).label("created_at_date"),
-            func.sum(models.Footprint.carbon_kg).label("total_carbon_kg"),
+            all_rows.c.user_id,
+            all_rows.c.entry_day,
+            func.sum(all_rows.c.carbon_kg).label("total_carbon_kg"),
         )
-        .group_by(models.Footprint.user_id, "created_at_date")
+        .group_by(all_rows.c.user_id, all_rows.c.entry_day)
         .subquery()
     )
 
     daily_average_footprints = (
         db.query(
-            func.date(daily_user_totals.c.created_at_date).label("created_at"),
-            func.avg(daily_user_totals.c.total_carbon_kg).label("carbon_kg"),
+            daily_user_totals.c.entry_day,
+            func.avg(
+                daily_user_totals.c.total_carbon_kg, type_=models.CarbonGrams
+            ).label("carbon_kg"),
         )
-        .group_by("created_at")
-        .order_by("created_at")
+        .group_by(daily_user_totals.c.entry_day)
+        .order_by(daily_user_totals.c.entry_day)
         .all()
     )
 
     formatted_results = [
-        {"created_at": row.created_at, "carbon_kg": row.carbon_kg}
+        {"entry_date": row.entry_day, "carbon_kg": row.carbon_kg}
         for row in daily_average_footprints
     ]
 
     return formatted_results
 
 
+def coalesce_key(db: Session, *parts):
+    # Primary and replica results differ in freshness, so never share them.
+    return (str(db.get_bind().url), *parts)
+
+
+@router.get("/all", response_model=List[schemas.FootprintAverageResponse])
+def get_all_footprints(
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(auth.get_read_db),
+    user: models.User = Depends(auth.get_current_reader),
+):
+    scope = versions.GLOBAL_SCOPE
+    version = versions.current(db, scope)
+    tag = versions.etag(scope, version, request)
+    not_modified = versions.not_modified(request, response, tag)
+    if not_modified:
+        return not_modified
+
+    # Only requests that read the same version may share a result, or a
+    # body computed before a write could go out under the newer ETag.
+    return aggregates.do(
+        coalesce_key(db, "daily_averages", version, start, end),
+        lambda: daily_averages(db, start, end),
+    )
+
+
+def load_rank_sketches(db: Session, month) -> dict:
+    sketches = defaultdict(QuantileSketch)
+    for row in db.query(models.RankSketch).filter_by(month=month):
+        sketches[row.activity_type].merge(QuantileSketch.from_dict(row.sketch))
+    return dict(sketches)
+
+
+@router.get("/rank", response_model=schemas.FootprintRankResponse)
+def get_footprint_rank(
+    db: Session = Depends(auth.get_read_db),
+    user: models.User = Depends(auth.get_current_reader),
+):
+    month = datetime.utcnow().date().replace(day=1)
+
+    user_totals = (
+        db.query(models.UserMonthlyTotal)
+        .filter_by(user_id=user.id, month=month)
+        .filter(models.UserMonthlyTotal.entry_count > 0)
+        .all()
+    )
+    version = versions.current(db, versions.GLOBAL_SCOPE)
+    sketches = aggregates.do(
+        coalesce_key(db, "rank_sketches", version, month),
+        lambda: load_rank_sketches(db, month),
+    )
+
+    overall = None
+    by_activity = []
+    for total in sorted(user_totals, key=lambda t: t.activity_type):
+        sketch = sketches.get(total.activity_type, QuantileSketch())
+        rank = schemas.ActivityRank(
+            activity_type=total.activity_type,
+            carbon_kg=round(total.carbon_kg, 1),
+            percentile=round(100 * sketch.rank(total.carbon_kg), 1),
+            users=sketch.count,
+        )
+        if total.activity_type == rollups.ALL_ACTIVITIES:
+            overall = rank
+        else:
+            by_activity.append(rank)
+
+    return {
+        "month": month.strftime("%Y-%m"),
+        "overall": overall,
+        "by_activity": by_activity,
+        "relative_error": RELATIVE_ERROR,
+    }
+
+
+@router.post("/simulate", response_model=schemas.SimulationResponse)
+def simulate_footprints(
+    request: schemas.SimulationRequest,
+    db: Session = Depends(auth.get_read_db),
+    user: models.User = Depends(auth.get_current_reader),
+):
+    return scenarios.simulate(db, user.id, request.substitutions)
+
+
 # def get_monthly_progress(footprints: List[models.Footprint]) -> Dict[str, float]:
 #     """Returns monthly CO₂ totals for a user."""
 #     from collections import defaultdict
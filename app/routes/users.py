@@ -1,16 +1,19 @@
 from datetime import datetime
 from typing import List
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
 from .. import models, schemas, auth
-from ..database import get_db
+from ..database import get_db, note_write
+from ..services import stats
 
 router = APIRouter(prefix="", tags=["Users"])
 
 @router.post("/register", response_model=schemas.UserResponse)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+def register(
+    user: schemas.UserCreate, response: Response, db: Session = Depends(get_db)
+):
     hashed_password = auth.get_password_hash(user.password)
     db_user = models.User(
         username=user.username,
@@ -20,13 +23,17 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     )
     db.add(db_user)
     db.commit()
+    # Replicas may not have the new user yet when the profile is fetched
+    note_write(db_user.id, response)
     db.refresh(db_user)
     return db_user
 
 
 @router.post("/login", response_model=schemas.Token)
 def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    response: Response,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db),
 ):
     user = db.query(models.User).filter(models.User.email == form_data.username).first()
     if not user:
@@ -37,6 +44,7 @@ def login(
 
     user.last_login_at = datetime.utcnow()
     db.commit()
+    note_write(user.id, response)
     db.refresh(user)
 
     access_token = auth.create_access_token({"sub": str(user.id)})
@@ -45,15 +53,24 @@ def login(
 
 @router.get("/profile", response_model=schemas.UserResponse)
 def read_users_me(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(auth.get_read_db),
+    current_user: models.User = Depends(auth.get_current_reader),
 ):
     return current_user
 
 
+@router.get("/profile/stats", response_model=schemas.UserStatsResponse)
+def read_profile_stats(
+    db: Session = Depends(auth.get_read_db),
+    current_user: models.User = Depends(auth.get_current_reader),
+):
+    return stats.summary(db, current_user.id)
+
+
 @router.put("/profile", response_model=schemas.UserResponse)
 def update_profile(
     updates: schemas.UserUpdate,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
@@ -84,6 +101,7 @@ def update_profile(
         current_user.email = updates.email
 
     db.commit()
+    note_write(current_user.id, response)
     db.refresh(current_user)
     return current_user
 
@@ -1,6 +1,6 @@
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Literal
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import date, datetime
 
 
 class UserBase(BaseModel):
@@ -22,6 +22,19 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
+class UserStatsResponse(BaseModel):
+    lifetime_kg: float = Field(..., description="Total carbon across all entries")
+    entry_count: int
+    this_month_kg: float
+    top_activity: Optional[str] = Field(
+        None, description="Activity with the highest lifetime total"
+    )
+    last_entry_date: Optional[date] = None
+    current_streak_days: int = Field(
+        ..., description="Consecutive days with entries, up to today or yesterday"
+    )
+
+
 class UserUpdate(BaseModel):
     username: Optional[str] = None
     email: Optional[str] = None
@@ -43,9 +56,9 @@ class FootprintBase(BaseModel):
     is_recurring: bool = Field(
         False, description="Whether this activity repeats automatically"
     )
-    recurrence_frequency: Optional[str] = Field(
-        None, description="Frequency: daily, weekly, monthly"
-    )
+    recurrence_frequency: Optional[
+        Literal["daily", "weekday", "weekly", "monthly"]
+    ] = Field(None, description="Frequency: daily, weekday, weekly, monthly")
     recurrence_end_date: Optional[datetime] = Field(
         None, description="When the recurrence stops"
     )
@@ -75,3 +88,82 @@ class FootprintAverageResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ActivityRank(BaseModel):
+    activity_type: str
+    carbon_kg: float = Field(..., description="Your total for the month")
+    percentile: float = Field(
+        ..., description="Percentage of users whose total is at or below yours"
+    )
+    users: int = Field(..., description="Number of users ranked")
+
+
+class FootprintRankResponse(BaseModel):
+    month: str = Field(..., description="Month ranked, as YYYY-MM")
+    overall: Optional[ActivityRank] = None
+    by_activity: List[ActivityRank] = []
+    relative_error: float = Field(
+        ...,
+        description="Totals within this relative distance of yours may be "
+        "counted on either side of you",
+    )
+
+
+class Substitution(BaseModel):
+    activity_type: str = Field(..., description="Activity the change applies to")
+    field: Optional[str] = Field(
+        None, description="Detail to change, e.g. 'type' or 'fuel_type'"
+    )
+    from_value: Optional[str] = Field(
+        None, description="Only change entries with this value (any if omitted)"
+    )
+    to_value: Optional[str] = Field(None, description="Replacement value")
+    to_activity_type: Optional[str] = Field(
+        None, description="Switch matching entries to another activity"
+    )
+    remove: bool = Field(False, description="Drop matching entries entirely")
+
+
+class SimulationRequest(BaseModel):
+    substitutions: List[Substitution]
+
+
+class MonthlyComparison(BaseModel):
+    month: str
+    before_kg: float
+    after_kg: float
+    estimated: bool = Field(
+        False,
+        description="The month includes archived totals, whose after_kg "
+        "is estimated without per-entry details",
+    )
+
+
+class SimulationResponse(BaseModel):
+    before_kg: float
+    after_kg: float
+    saved_kg: float
+    months: List[MonthlyComparison]
+
+
+class DeletionJobResponse(BaseModel):
+    id: int
+    status: str = Field(..., description="pending, running, done or failed")
+    activity_type: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    deleted_count: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class FootprintChangesResponse(BaseModel):
+    cursor: int = Field(..., description="Pass as `since` on the next call")
+    has_more: bool = Field(..., description="More changes are waiting past cursor")
+    upserts: List[FootprintResponse]
+    deletes: List[int] = Field(..., description="Ids of footprints removed")
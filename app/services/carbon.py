@@ -2,7 +2,8 @@ from typing import Dict, List  # Fixed: added List
 from fastapi import HTTPException
 
 # ------------------ CONSTANTS ------------------
-VALID_ACTIVITIES = {
+# Stored as small-integer codes (position + 1), so only ever append here
+ACTIVITY_TYPES = (
     "flight",
     "driving",
     "train",
@@ -24,7 +25,10 @@ VALID_ACTIVITIES = {
     "gaming",
     "events",
     "hotel_stays",
-}
+)
+VALID_ACTIVITIES = set(ACTIVITY_TYPES)
+
+RECURRENCE_FREQUENCIES = ("daily", "weekday", "weekly", "monthly")
 
 TRANSPORT_FACTORS = {
     "flight": {"short": 500, "long": 2000, "factor": 0.115},
@@ -78,6 +82,20 @@ LIFESTYLE_FACTORS = {
     "hotel_stays": 82 / 12,
 }
 
+# The categorical defaults calculate_carbon falls back to when a key is missing
+DETAIL_DEFAULTS = {
+    "flight": {"flight_type": "short"},
+    "driving": {"commute": "short", "fuel_type": "petrol"},
+    "train": {"commute": "short"},
+    "tube": {"commute": "short"},
+    "bus": {"commute": "short"},
+    "meat": {"type": "beef"},
+    "dairy": {"type": "milk"},
+    "food_waste": {"frequency": "weekly"},
+    "clothing": {"frequency": "monthly"},
+    "electronics": {"frequency": "rare"},
+}
+
 
 # ------------------ FUNCTIONS ------------------
 def calculate_carbon(activity_type: str, details: Dict) -> float:
@@ -224,3 +242,12 @@ def suggest_offsets(carbon_kg: float) -> List[str]:  # Fixed: capital List
             "Switch to renewable energy provider",
             "Reduce air travel where possible",
         ]
+
+
+def prime_factor_engine() -> None:
+    """
+    Run every activity through calculate_carbon once at startup so the first
+    real request doesn't pay for any cold code paths.
+    """
+    for activity_type in sorted(VALID_ACTIVITIES):
+        calculate_carbon(activity_type, {})
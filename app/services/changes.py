@@ -0,0 +1,135 @@
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, Tuple
+from sqlalchemy import func, insert, literal
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import insert_ignore
+
+CHANGE_RETENTION_DAYS = int(os.getenv("CHANGE_RETENTION_DAYS", 30))
+# Highest change id pruned so far, per user, kept as data_versions counters.
+# The unsuffixed scope is the single watermark of earlier releases, still
+# honoured for changes pruned under it.
+PRUNED_SCOPE = "changes:pruned_through"
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Clients page through the feed by id, so a user's changes must commit in id
+# order: a change that commits after a higher id has been read would be
+# skipped. Autoincrement ids don't guarantee that across concurrent
+# transactions, so every writer locks the user's user_stats row
+# (stats.lock, or the rollups hooks) before adding to the feed and holds it
+# until commit. Writes for the same user are therefore serialised.
+
+
+def record_upserts(db: Session, user_id: int, footprints: Iterable[models.Footprint]):
+    """
+    Log created/updated footprints to the feed. Flushes so new rows have ids.
+    """
+    footprints = list(footprints)
+    db.flush()
+    now = datetime.utcnow()
+    db.add_all(
+        models.FootprintChange(
+            user_id=user_id, footprint_id=footprint.id, op=UPSERT, changed_at=now
+        )
+        for footprint in footprints
+    )
+    db.flush()
+
+
+def record_deletes(db: Session, query):
+    """
+    Write a tombstone for every footprint matched by `query`, straight from
+    the database. Must be called before the rows are deleted.
+    """
+    rows = query.with_entities(
+        models.Footprint.user_id,
+        models.Footprint.id,
+        literal(DELETE),
+        literal(datetime.utcnow()),
+    )
+    db.execute(
+        insert(models.FootprintChange).from_select(
+            ["user_id", "footprint_id", "op", "changed_at"], rows.statement
+        )
+    )
+
+
+def record_deleted(db: Session, deleted: Iterable[Tuple[int, int]]):
+    """
+    Write a tombstone for each (user_id, footprint_id) already deleted.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "footprint_id": footprint_id,
+            "op": DELETE,
+            "changed_at": now,
+        }
+        for user_id, footprint_id in deleted
+    ]
+    if rows:
+        db.execute(insert(models.FootprintChange), rows)
+
+
+def latest_cursor(db: Session, user_id: int) -> int:
+    latest = (
+        db.query(func.max(models.FootprintChange.id))
+        .filter(models.FootprintChange.user_id == user_id)
+        .scalar()
+        or 0
+    )
+    # Never hand out a cursor the feed would reject as pruned
+    return max(latest, pruned_through(db, user_id))
+
+
+def _pruned_scope(user_id: int) -> str:
+    return f"{PRUNED_SCOPE}:user:{user_id}"
+
+
+def pruned_through(db: Session, user_id: int) -> int:
+    """
+    Highest id of the user's changes pruned so far. A cursor below it may
+    have missed changes; one at or above it is complete, however long the
+    user has been idle.
+    """
+    rows = (
+        db.query(models.DataVersion.version)
+        .filter(models.DataVersion.scope.in_([PRUNED_SCOPE, _pruned_scope(user_id)]))
+        .all()
+    )
+    return max((row.version for row in rows), default=0)
+
+
+def prune(db: Session, retention_days: int = CHANGE_RETENTION_DAYS) -> int:
+    """
+    Drop feed entries older than the retention window. Clients holding a
+    cursor from before the user's pruned range have to resync from
+    /footprints/self.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    old = db.query(models.FootprintChange).filter(
+        models.FootprintChange.changed_at < cutoff
+    )
+    highest = old.with_entities(func.max(models.FootprintChange.id)).scalar()
+    if highest is None:
+        return 0
+
+    prunable = db.query(models.FootprintChange).filter(
+        models.FootprintChange.id <= highest
+    )
+    through_by_user = prunable.with_entities(
+        models.FootprintChange.user_id, func.max(models.FootprintChange.id)
+    ).group_by(models.FootprintChange.user_id)
+    for user_id, through in through_by_user.all():
+        scope = _pruned_scope(user_id)
+        insert_ignore(db, models.DataVersion, scope=scope, version=0)
+        db.query(models.DataVersion).filter(
+            models.DataVersion.scope == scope, models.DataVersion.version < through
+        ).update({models.DataVersion.version: through}, synchronize_session=False)
+    pruned = prunable.delete(synchronize_session=False)
+    db.commit()
+    return pruned
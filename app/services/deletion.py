@@ -0,0 +1,159 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import SessionLocal, note_write
+from . import rollups
+from .partitions import in_date_range
+
+DELETE_CHUNK_SIZE = int(os.getenv("DELETE_CHUNK_SIZE", 1000))
+# A running job touches heartbeat_at after every chunk; one silent for this
+# long lost its worker
+DELETE_JOB_STALE_SECONDS = int(os.getenv("DELETE_JOB_STALE_SECONDS", 300))
+
+
+def _scoped_footprints(db: Session, job: models.DeletionJob):
+    query = db.query(models.Footprint).filter(
+        models.Footprint.user_id == job.user_id
+    )
+    if job.activity_type is not None:
+        query = query.filter(models.Footprint.activity_type == job.activity_type)
+    return in_date_range(query, models.Footprint.entry_date, job.start, job.end)
+
+
+def _first_day_from(value: Optional[datetime]) -> Optional[date]:
+    if value is None:
+        return None
+    day = value.date()
+    return day if value.time() == datetime.min.time() else day + timedelta(days=1)
+
+
+def _scoped_archive(db: Session, job: models.DeletionJob):
+    """
+    Archived rows only keep the day, so they count as falling at midnight:
+    a day is in range only if the whole day is, and a partially covered
+    day is left alone.
+    """
+    query = db.query(models.FootprintArchive).filter(
+        models.FootprintArchive.user_id == job.user_id
+    )
+    if job.activity_type is not None:
+        query = query.filter(
+            models.FootprintArchive.activity_type == job.activity_type
+        )
+    # The end bound is exclusive: a day is out if the range stops partway in
+    return in_date_range(
+        query,
+        models.FootprintArchive.entry_date,
+        _first_day_from(job.start),
+        job.end.date() if job.end is not None else None,
+    )
+
+
+def delete_next_chunk(
+    db: Session, job: models.DeletionJob, after_id: int, chunk_size: int
+):
+    """
+    Delete the next `chunk_size` matching footprints with id > after_id in
+    their own short transaction. Returns the last id deleted, or None when
+    nothing is left.
+    """
+    scoped = _scoped_footprints(db, job)
+    ids = [
+        row.id
+        for row in scoped.with_entities(models.Footprint.id)
+        .filter(models.Footprint.id > after_id)
+        .order_by(models.Footprint.id)
+        .limit(chunk_size)
+    ]
+    if not ids:
+        return None
+
+    chunk = scoped.filter(
+        models.Footprint.id > after_id, models.Footprint.id <= ids[-1]
+    )
+    rollups.record_removed(db, job.user_id, chunk)
+    job.deleted_count += chunk.delete(synchronize_session=False)
+    job.heartbeat_at = datetime.utcnow()
+    db.commit()
+    note_write(job.user_id)
+    return ids[-1]
+
+
+def delete_archived(db: Session, job: models.DeletionJob) -> int:
+    """
+    Delete the job's range from footprint_archive in one transaction; it
+    holds at most one row per day and activity. Returns the number of
+    original entries removed.
+    """
+    scoped = _scoped_archive(db, job)
+    entries = (
+        scoped.with_entities(func.sum(models.FootprintArchive.entry_count)).scalar()
+        or 0
+    )
+    if entries:
+        rollups.record_archive_removed(db, job.user_id, scoped)
+        scoped.delete(synchronize_session=False)
+        job.deleted_count += entries
+    job.heartbeat_at = datetime.utcnow()
+    db.commit()
+    if entries:
+        note_write(job.user_id)
+    return entries
+
+
+def fail_abandoned_jobs(db: Session) -> int:
+    """
+    Mark jobs whose worker died (e.g. in a restart) as failed, so clients
+    polling them stop waiting. The chunks they finished stay deleted.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=DELETE_JOB_STALE_SECONDS)
+    abandoned = (
+        db.query(models.DeletionJob)
+        .filter(
+            models.DeletionJob.status.in_(("pending", "running")),
+            func.coalesce(
+                models.DeletionJob.heartbeat_at, models.DeletionJob.created_at
+            )
+            < cutoff,
+        )
+        .update(
+            {
+                models.DeletionJob.status: "failed",
+                models.DeletionJob.error: "Interrupted, submit the deletion again",
+                models.DeletionJob.finished_at: datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return abandoned
+
+
+def run_deletion_job(job_id: int, chunk_size: int = DELETE_CHUNK_SIZE):
+    db = SessionLocal()
+    try:
+        job = db.get(models.DeletionJob, job_id)
+        if job is None:
+            return
+        job.status = "running"
+        job.heartbeat_at = datetime.utcnow()
+        db.commit()
+
+        last_id = 0
+        try:
+            while last_id is not None:
+                last_id = delete_next_chunk(db, job, last_id, chunk_size)
+            delete_archived(db, job)
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e)
+        else:
+            job.status = "done"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import secrets
+import time
+from datetime import datetime, timedelta
+from typing import Any, NamedTuple, Optional
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .. import models
+
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", 24))
+# How long an unfinished claim blocks the key before it is presumed abandoned
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", 60))
+# How long a duplicate waits for the original request to finish
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 10))
+POLL_INTERVAL_SECONDS = 0.05
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def request_hash(route: str, payload: Any) -> str:
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True)
+    return _hash(f"{route}\n{body}")
+
+
+class Claim(NamedTuple):
+    user_id: int
+    key_hash: Optional[str]
+    # Identifies this request's claim, so a request that outlived its lease
+    # can't complete or release the claim of the one that took over
+    token: Optional[str]
+    # The stored response to send instead, when the key was used already
+    replay: Optional[JSONResponse]
+
+
+def _key_filter(db: Session, user_id: int, key_hash: str):
+    return db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.user_id == user_id,
+        models.IdempotencyKey.key_hash == key_hash,
+    )
+
+
+def claim(
+    db: Session, user_id: int, key: Optional[str], route: str, payload: Any
+) -> Claim:
+    """
+    Reserve `key` for this request. The caller goes ahead with the write
+    unless the returned claim has a `replay`: the stored response of an
+    earlier use of the key. A duplicate that arrives while the first is
+    still running waits for it to finish.
+    """
+    if key is None:
+        return Claim(user_id, None, None, None)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters",
+        )
+
+    key_hash = _hash(key)
+    fingerprint = request_hash(route, payload)
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = datetime.utcnow()
+        token = secrets.token_hex(16)
+        try:
+            db.execute(
+                insert(models.IdempotencyKey).values(
+                    user_id=user_id,
+                    key_hash=key_hash,
+                    request_hash=fingerprint,
+                    claim_token=token,
+                    expires_at=now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS),
+                )
+            )
+            db.commit()
+            return Claim(user_id, key_hash, token, None)
+        except IntegrityError:
+            db.rollback()
+
+        row = _key_filter(db, user_id, key_hash).populate_existing().first()
+        if row is None:
+            # Released or purged since our insert failed
+            continue
+        if row.expires_at <= now:
+            # Only remove the exact row we saw, not a newer claim
+            _key_filter(db, user_id, key_hash).filter(
+                models.IdempotencyKey.expires_at == row.expires_at
+            ).delete(synchronize_session=False)
+            db.commit()
+            continue
+        if row.request_hash != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for a different request",
+            )
+        if row.status_code is not None:
+            replay = JSONResponse(
+                status_code=row.status_code,
+                content=row.response,
+                headers={REPLAYED_HEADER: "true"},
+            )
+            db.rollback()
+            return Claim(user_id, key_hash, None, replay)
+
+        db.rollback()
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+            )
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def _owned(db: Session, claim: Claim):
+    return _key_filter(db, claim.user_id, claim.key_hash).filter(
+        models.IdempotencyKey.claim_token == claim.token,
+        models.IdempotencyKey.status_code.is_(None),
+    )
+
+
+def complete(db: Session, claim: Claim, response: Any, status_code: int = 200):
+    """
+    Store the response for the claimed key in the caller's transaction, so
+    it commits together with the rows it describes. Raises a 409 if the
+    claim's lease ran out and another request took the key over; the caller
+    must then roll its write back.
+    """
+    if claim.key_hash is None:
+        return
+    updated = _owned(db, claim).update(
+        {
+            models.IdempotencyKey.status_code: status_code,
+            models.IdempotencyKey.response: jsonable_encoder(response),
+            models.IdempotencyKey.expires_at: datetime.utcnow()
+            + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        },
+        synchronize_session=False,
+    )
+    if not updated:
+        raise HTTPException(
+            status_code=409,
+            detail="The request took too long and its Idempotency-Key was "
+            "taken over by a retry",
+        )
+
+
+def release(db: Session, claim: Claim):
+    """
+    Drop an unfinished claim after the write failed, so a retry runs again.
+    """
+    if claim.key_hash is None:
+        return
+    _owned(db, claim).delete(synchronize_session=False)
+    db.commit()
+
+
+def purge(db: Session) -> int:
+    purged = (
+        db.query(models.IdempotencyKey)
+        .filter(models.IdempotencyKey.expires_at < datetime.utcnow())
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return purged
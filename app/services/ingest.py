@@ -0,0 +1,170 @@
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import List, Tuple
+from .. import models, schemas
+from ..database import SessionLocal, note_write
+from . import rollups
+
+# Opt-in: buffer single-footprint POSTs and commit them in groups
+GROUP_COMMIT_ENABLED = os.getenv("FOOTPRINT_GROUP_COMMIT", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+GROUP_COMMIT_MAX_ROWS = int(os.getenv("GROUP_COMMIT_MAX_ROWS", 200))
+GROUP_COMMIT_MAX_WAIT_MS = int(os.getenv("GROUP_COMMIT_MAX_WAIT_MS", 10))
+GROUP_COMMIT_TIMEOUT_SECONDS = float(os.getenv("GROUP_COMMIT_TIMEOUT_SECONDS", 30))
+
+Pending = Tuple[models.Footprint, Future]
+
+
+class GroupCommitWriter:
+    """
+    Collects footprints from request threads and writes them from a single
+    background thread, as one multi-row INSERT and one commit per group of
+    up to `max_rows` rows or `max_wait_ms` of waiting, whichever comes first.
+    Each caller blocks until its own row is committed and gets back the
+    stored row or the error it hit.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_rows: int = GROUP_COMMIT_MAX_ROWS,
+        max_wait_ms: int = GROUP_COMMIT_MAX_WAIT_MS,
+    ):
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Pending]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.rows = 0
+        self.commits = 0
+        self.fallbacks = 0
+        self.busy_seconds = 0.0
+
+    def write(self, footprint: models.Footprint) -> schemas.FootprintResponse:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((footprint, future))
+        try:
+            return future.result(timeout=GROUP_COMMIT_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            # Still queued: withdraw the row so the error we report is true.
+            # Otherwise its group is already being committed; wait for it.
+            if future.cancel():
+                raise
+            return future.result()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="footprint-group-commit", daemon=True
+                )
+                self._thread.start()
+
+    def _next_group(self) -> List[Pending]:
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(group) < self.max_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                group.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        while True:
+            # Skip rows whose caller gave up waiting
+            group = [
+                pending
+                for pending in self._next_group()
+                if pending[1].set_running_or_notify_cancel()
+            ]
+            if not group:
+                continue
+            started = time.perf_counter()
+            try:
+                self._commit_group(group)
+            except Exception:
+                # One bad row shouldn't fail its neighbours: retry each alone
+                with self._stats_lock:
+                    self.fallbacks += 1
+                for pending in group:
+                    try:
+                        self._commit_group([pending])
+                    except Exception as e:
+                        pending[1].set_exception(e)
+            with self._stats_lock:
+                self.busy_seconds += time.perf_counter() - started
+
+    def _commit_group(self, group: List[Pending]):
+        db = self.session_factory()
+        try:
+            by_user = defaultdict(list)
+            for footprint, _ in group:
+                by_user[footprint.user_id].append(footprint)
+            # Several users share sketch rows: lock everything up front, in
+            # the same order as every other writer, before adding the rows
+            rollups.lock(
+                db,
+                {
+                    user_id: rollups.totals_for_footprints(footprints)
+                    for user_id, footprints in by_user.items()
+                },
+            )
+            db.add_all(footprint for footprint, _ in group)
+            for user_id, footprints in sorted(by_user.items()):
+                rollups.record_added(db, user_id, footprints)
+
+            # Ids and defaults are assigned by the flush inside record_added
+            results = [
+                schemas.FootprintResponse.model_validate(footprint)
+                for footprint, _ in group
+            ]
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Rolled-back rows keep the ids the flush gave them; clear them
+            # so a retry gets fresh ones
+            for footprint, _ in group:
+                footprint.id = None
+            raise
+        finally:
+            db.close()
+
+        for user_id in by_user:
+            note_write(user_id)
+        for (_, future), result in zip(group, results):
+            future.set_result(result)
+        with self._stats_lock:
+            self.rows += len(group)
+            self.commits += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "enabled": GROUP_COMMIT_ENABLED,
+                "rows": self.rows,
+                "commits": self.commits,
+                "fallbacks": self.fallbacks,
+                "rows_per_commit": round(self.rows / self.commits, 1)
+                if self.commits
+                else 0.0,
+                "rows_per_busy_second": round(self.rows / self.busy_seconds, 1)
+                if self.busy_seconds
+                else 0.0,
+            }
+
+
+writer = GroupCommitWriter()
@@ -0,0 +1,214 @@
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import delete, func, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from .. import models
+from . import changes, idempotency, stats, versions
+
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", 12))
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 13))
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"footprints_p{month:%Y%m}"
+
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def in_date_range(
+    query, column, start: Optional[datetime], end: Optional[datetime]
+):
+    # Bounding entry_date lets Postgres prune monthly partitions and SQLite
+    # use the (user_id, entry_date) index.
+    if start is not None:
+        query = query.filter(column >= start)
+    if end is not None:
+        query = query.filter(column < end)
+    return query
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.bind.dialect.name != "postgresql":
+        return False
+    return bool(
+        db.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = 'footprints'::regclass"
+            )
+        ).first()
+    )
+
+
+def ensure_partitions(db: Session, months_ahead: int = PARTITION_MONTHS_AHEAD):
+    """
+    Create the monthly footprints partitions for the current month and the
+    next `months_ahead` months. No-op when the table isn't partitioned.
+    """
+    if not is_partitioned(db):
+        return
+
+    month = month_start(datetime.utcnow().date())
+    for _ in range(months_ahead + 1):
+        next_month = add_months(month, 1)
+        db.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" '
+                f"PARTITION OF footprints "
+                f"FOR VALUES FROM ('{month}') TO ('{next_month}')"
+            )
+        )
+        month = next_month
+    db.commit()
+
+
+def _drop_partition(db: Session, month: date) -> bool:
+    """
+    Drop the month's partition once archiving has emptied it. Left in place
+    if rows were backfilled into it since, or if it is in use: waiting for
+    the lock could deadlock with a writer that needs a lock we hold.
+    """
+    name = partition_name(month)
+    exists = db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+    if not exists:
+        return False
+    try:
+        with db.begin_nested():
+            db.execute(text(f'LOCK TABLE "{name}" IN ACCESS EXCLUSIVE MODE NOWAIT'))
+    except OperationalError:
+        return False
+    if db.execute(text(f'SELECT 1 FROM "{name}" LIMIT 1')).first():
+        return False
+    db.execute(text(f'DROP TABLE "{name}"'))
+    return True
+
+
+def archive_month(db: Session, month: date) -> int:
+    """
+    Fold every footprint in `month` into footprint_archive as per-user daily
+    totals and remove the raw rows, in one transaction.
+
+    entry_date comes from clients, so rows can be backfilled into the month
+    while this runs. The totals are built from exactly the rows the DELETE
+    removed; anything committed after it stays live until the next run.
+    """
+    start = datetime.combine(month, datetime.min.time())
+    end = datetime.combine(add_months(month, 1), datetime.min.time())
+    in_month = (
+        models.Footprint.entry_date >= start,
+        models.Footprint.entry_date < end,
+    )
+
+    while True:
+        user_ids = {
+            row.user_id
+            for row in db.query(models.Footprint.user_id).filter(*in_month).distinct()
+        }
+        # Taken before the rows are removed, like any other change feed write
+        stats.lock(db, user_ids)
+        versions.lock(db, user_ids)
+        removed = db.execute(
+            delete(models.Footprint)
+            .where(*in_month)
+            .returning(
+                models.Footprint.id,
+                models.Footprint.user_id,
+                models.Footprint.activity_type,
+                models.Footprint.entry_date,
+                models.Footprint.created_at,
+                models.Footprint.carbon_kg,
+            )
+        ).all()
+        if {row.user_id for row in removed} <= user_ids:
+            break
+        # A user we hadn't locked backfilled the month in between
+        db.rollback()
+
+    daily_totals = defaultdict(lambda: [0.0, 0])
+    for row in removed:
+        key = (
+            row.user_id,
+            row.activity_type,
+            _as_date(row.entry_date),
+            _as_date(row.created_at),
+        )
+        daily_totals[key][0] += row.carbon_kg
+        daily_totals[key][1] += 1
+
+    for user_id in user_ids:
+        # Archived rows drop out of /footprints/self
+        versions.bump(db, user_id)
+    for key, (carbon_kg, entry_count) in daily_totals.items():
+        user_id, activity_type, entry_day, created_day = key
+        db.add(
+            models.FootprintArchive(
+                user_id=user_id,
+                activity_type=activity_type,
+                entry_date=entry_day,
+                created_date=created_day,
+                carbon_kg=carbon_kg,
+                entry_count=entry_count,
+            )
+        )
+
+    # Archived rows leave /footprints/self, so synced clients drop them too
+    changes.record_deleted(db, ((row.user_id, row.id) for row in removed))
+
+    if is_partitioned(db):
+        _drop_partition(db, month)
+
+    db.commit()
+    return len(removed)
+
+
+def archive_closed_periods(
+    db: Session, keep_months: int = ARCHIVE_AFTER_MONTHS
+) -> dict:
+    """
+    Archive every month older than the last `keep_months` months.
+    Returns the number of raw rows archived per month.
+    """
+    cutoff = datetime.combine(
+        add_months(month_start(datetime.utcnow().date()), -keep_months),
+        datetime.min.time(),
+    )
+    archived = {}
+    while True:
+        oldest = (
+            db.query(func.min(models.Footprint.entry_date))
+            .filter(models.Footprint.entry_date < cutoff)
+            .scalar()
+        )
+        if oldest is None:
+            return archived
+        month = month_start(_as_date(oldest))
+        archived[f"{month:%Y-%m}"] = archive_month(db, month)
+
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        ensure_partitions(session)
+        print(archive_closed_periods(session))
+        changes.prune(session)
+        idempotency.purge(session)
+    finally:
+        session.close()
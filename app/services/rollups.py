@@ -0,0 +1,320 @@
+import os
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import insert_ignore
+from . import changes, stats, versions
+from .sketch import QuantileSketch
+
+ALL_ACTIVITIES = "all"
+# Changing this moves users between shards: rebuild the sketches after
+RANK_SKETCH_SHARDS = int(os.getenv("RANK_SKETCH_SHARDS", 16))
+
+# (month, activity_type) -> [carbon_kg, entry_count]
+Totals = Dict[Tuple[date, str], list]
+
+
+def _month_of(value) -> date:
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return date(value.year, value.month, 1)
+
+
+def _add(totals: Totals, month: date, activity_type: str, carbon_kg, count: int):
+    for key in ((month, activity_type), (month, ALL_ACTIVITIES)):
+        entry = totals.setdefault(key, [0.0, 0])
+        entry[0] += carbon_kg
+        entry[1] += count
+
+
+def totals_for_footprints(footprints: Iterable[models.Footprint]) -> Totals:
+    totals: Totals = {}
+    for footprint in footprints:
+        _add(
+            totals,
+            _month_of(footprint.entry_date),
+            footprint.activity_type,
+            footprint.carbon_kg,
+            1,
+        )
+    return totals
+
+
+def totals_for_query(query) -> Totals:
+    """
+    Per-month totals for the footprints matched by `query`, aggregated in the
+    database by day so we never load the rows themselves.
+    """
+    subquery = query.with_entities(
+        models.Footprint.activity_type,
+        models.Footprint.entry_date,
+        models.Footprint.carbon_kg.label("carbon_kg"),
+    ).subquery()
+    daily = (
+        query.session.query(
+            subquery.c.activity_type,
+            func.date(subquery.c.entry_date).label("entry_day"),
+            func.sum(subquery.c.carbon_kg).label("carbon_kg"),
+            func.count().label("entry_count"),
+        )
+        .group_by(subquery.c.activity_type, "entry_day")
+        .all()
+    )
+    totals: Totals = {}
+    for row in daily:
+        _add(
+            totals,
+            _month_of(row.entry_day),
+            row.activity_type,
+            row.carbon_kg,
+            row.entry_count,
+        )
+    return totals
+
+
+def totals_for_archive(query) -> Totals:
+    """
+    Per-month totals for the footprint_archive rows matched by `query`.
+    """
+    totals: Totals = {}
+    rows = query.with_entities(
+        models.FootprintArchive.activity_type,
+        models.FootprintArchive.entry_date,
+        models.FootprintArchive.carbon_kg,
+        models.FootprintArchive.entry_count,
+    )
+    for row in rows:
+        _add(
+            totals,
+            _month_of(row.entry_date),
+            row.activity_type,
+            row.carbon_kg,
+            row.entry_count,
+        )
+    return totals
+
+
+def sketch_shard(user_id: int) -> int:
+    return user_id % RANK_SKETCH_SHARDS
+
+
+def _locked_sketch(
+    db: Session, month: date, activity_type: str, shard: int
+) -> models.RankSketch:
+    """
+    Lock a rank sketch row, creating it if it doesn't exist yet. A missing
+    row can't be locked, so it is inserted first (a no-op if a concurrent
+    writer got there first) and then selected again.
+    """
+    query = (
+        db.query(models.RankSketch)
+        .filter_by(month=month, activity_type=activity_type, shard=shard)
+        .with_for_update()
+    )
+    row = query.first()
+    if row is None:
+        insert_ignore(
+            db,
+            models.RankSketch,
+            month=month,
+            activity_type=activity_type,
+            shard=shard,
+            sketch=QuantileSketch().to_dict(),
+        )
+        row = query.first()
+    return row
+
+
+def lock(db: Session, totals_by_user: Dict[int, Totals]):
+    """
+    Take the locks for writing several users' totals in one transaction:
+    their stats rows by user id, the rank sketch rows they touch by
+    (month, activity, shard), then their global version counters. Writers
+    covering more than one user call this before anything else, so that
+    they lock shared rows in the same order as everyone else.
+    """
+    stats.lock(db, totals_by_user)
+    keys = {
+        (month, activity_type, sketch_shard(user_id))
+        for user_id, totals in totals_by_user.items()
+        for month, activity_type in totals
+    }
+    for key in sorted(keys):
+        _locked_sketch(db, *key)
+    versions.lock(db, totals_by_user)
+
+
+def apply_totals(db: Session, user_id: int, totals: Totals, sign: int = 1):
+    """
+    Fold `totals` into the user's monthly rollups and their shard of the rank
+    sketches. Runs inside the caller's transaction; nothing is committed here.
+
+    Sketch rows are shared by every user in the shard, so they are locked in
+    (month, activity) order whatever order `totals` comes in.
+    """
+    shard = sketch_shard(user_id)
+    for (month, activity_type), (carbon_kg, count) in sorted(totals.items()):
+        rollup = (
+            db.query(models.UserMonthlyTotal)
+            .filter_by(user_id=user_id, month=month, activity_type=activity_type)
+            .with_for_update()
+            .first()
+        )
+        if rollup is None:
+            rollup = models.UserMonthlyTotal(
+                user_id=user_id,
+                month=month,
+                activity_type=activity_type,
+                carbon_kg=0.0,
+                entry_count=0,
+            )
+            db.add(rollup)
+
+        old_total, old_count = rollup.carbon_kg, rollup.entry_count
+        # Round to the stored gram precision so the value removed from the
+        # sketch next time is exactly the one added now.
+        rollup.carbon_kg = round(max(0.0, old_total + sign * carbon_kg), 3)
+        rollup.entry_count = max(0, old_count + sign * count)
+
+        row = _locked_sketch(db, month, activity_type, shard)
+        sketch = QuantileSketch.from_dict(row.sketch)
+        if old_count > 0:
+            sketch.remove(old_total)
+        if rollup.entry_count > 0:
+            sketch.add(rollup.carbon_kg)
+        row.sketch = sketch.to_dict()
+
+    db.flush()
+
+
+def _by_activity(totals: Totals) -> stats.ActivityTotals:
+    lifetime: stats.ActivityTotals = {}
+    for (_, activity_type), (carbon_kg, count) in totals.items():
+        if activity_type == ALL_ACTIVITIES:
+            continue
+        entry = lifetime.setdefault(activity_type, [0.0, 0])
+        entry[0] += carbon_kg
+        entry[1] += count
+    return lifetime
+
+
+def record_added(db: Session, user_id: int, footprints: Iterable[models.Footprint]):
+    footprints = list(footprints)
+    totals = totals_for_footprints(footprints)
+    db.flush()
+    # Stats go first: their row lock orders this user's change feed
+    stats.record_added(
+        db,
+        user_id,
+        _by_activity(totals),
+        [footprint.entry_date for footprint in footprints],
+    )
+    apply_totals(db, user_id, totals, sign=1)
+    versions.bump(db, user_id)
+    changes.record_upserts(db, user_id, footprints)
+
+
+def record_removed(db: Session, user_id: int, query):
+    """
+    Must be called before `query` is used to delete the rows.
+    """
+    totals = totals_for_query(query)
+    # Stats go first: their row lock orders this user's change feed
+    stats.record_removed(db, user_id, _by_activity(totals), query)
+    apply_totals(db, user_id, totals, sign=-1)
+    versions.bump(db, user_id)
+    changes.record_deletes(db, query)
+
+
+def record_archive_removed(db: Session, user_id: int, query):
+    """
+    record_removed for footprint_archive rows. Archived rows left the change
+    feed when they were archived, so there is nothing to tombstone.
+    """
+    totals = totals_for_archive(query)
+    stats.record_removed(
+        db, user_id, _by_activity(totals), query, model=models.FootprintArchive
+    )
+    apply_totals(db, user_id, totals, sign=-1)
+    versions.bump(db, user_id)
+
+
+def _daily_rows(db: Session, model, entry_count):
+    return (
+        db.query(
+            model.user_id,
+            model.activity_type,
+            func.date(model.entry_date).label("entry_day"),
+            func.sum(model.carbon_kg).label("carbon_kg"),
+            entry_count.label("entry_count"),
+        )
+        .group_by(model.user_id, model.activity_type, "entry_day")
+        .yield_per(1000)
+    )
+
+
+def rebuild(db: Session):
+    """
+    Recompute every rollup and sketch from the footprint rows and the archive.
+    """
+    by_user: Dict[int, Totals] = defaultdict(dict)
+    sources = (
+        _daily_rows(db, models.Footprint, func.count(models.Footprint.id)),
+        _daily_rows(
+            db,
+            models.FootprintArchive,
+            func.sum(models.FootprintArchive.entry_count),
+        ),
+    )
+    for rows in sources:
+        for row in rows:
+            _add(
+                by_user[row.user_id],
+                _month_of(row.entry_day),
+                row.activity_type,
+                row.carbon_kg,
+                row.entry_count,
+            )
+
+    db.query(models.RankSketch).delete()
+    db.query(models.UserMonthlyTotal).delete()
+
+    sketches = defaultdict(QuantileSketch)
+    for user_id, totals in by_user.items():
+        for (month, activity_type), (carbon_kg, count) in totals.items():
+            db.add(
+                models.UserMonthlyTotal(
+                    user_id=user_id,
+                    month=month,
+                    activity_type=activity_type,
+                    carbon_kg=round(carbon_kg, 3),
+                    entry_count=count,
+                )
+            )
+            sketches[(month, activity_type, sketch_shard(user_id))].add(
+                round(carbon_kg, 3)
+            )
+
+    for (month, activity_type, shard), sketch in sketches.items():
+        db.add(
+            models.RankSketch(
+                month=month,
+                activity_type=activity_type,
+                shard=shard,
+                sketch=sketch.to_dict(),
+            )
+        )
+    db.commit()
+
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        rebuild(session)
+    finally:
+        session.close()
@@ -0,0 +1,161 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .. import models, schemas
+from .carbon import DETAIL_DEFAULTS, VALID_ACTIVITIES, calculate_carbon
+
+
+def month_label(db: Session, column):
+    if db.bind.dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def _validate(substitutions: List[schemas.Substitution]):
+    for sub in substitutions:
+        for activity_type in (sub.activity_type, sub.to_activity_type):
+            if activity_type is not None and activity_type not in VALID_ACTIVITIES:
+                raise HTTPException(
+                    status_code=400, detail=f"Invalid activity_type: {activity_type}"
+                )
+
+
+def _matches(sub: schemas.Substitution, activity_type: str, details: Dict) -> bool:
+    if sub.activity_type != activity_type:
+        return False
+    if sub.field is None or sub.from_value is None:
+        return True
+    default = DETAIL_DEFAULTS.get(activity_type, {}).get(sub.field)
+    return str(details.get(sub.field, default)) == sub.from_value
+
+
+def apply_substitutions(
+    substitutions: List[schemas.Substitution], activity_type: str, details: Dict
+) -> Optional[Tuple[str, Dict]]:
+    """
+    Return the (activity_type, details) an entry would have under the scenario,
+    or None if the scenario removes it. Substitutions apply in order.
+    """
+    for sub in substitutions:
+        if not _matches(sub, activity_type, details):
+            continue
+        if sub.remove:
+            return None
+        if sub.field is not None and sub.to_value is not None:
+            details = {**details, sub.field: sub.to_value}
+        if sub.to_activity_type is not None:
+            activity_type = sub.to_activity_type
+    return activity_type, details
+
+
+def _archive_ratio(
+    substitutions: List[schemas.Substitution], activity_type: str
+) -> float:
+    """
+    after/before factor for archived totals of `activity_type`. Archived rows
+    keep no details, so only substitutions that apply to every entry of the
+    activity are used, and their effect is estimated from the calculator's
+    default entry.
+    """
+    unconditional = [
+        sub for sub in substitutions if sub.field is None or sub.from_value is None
+    ]
+    scenario = apply_substitutions(unconditional, activity_type, {})
+    if scenario is None:
+        return 0.0
+    before_kg = calculate_carbon(activity_type, {})
+    if scenario == (activity_type, {}) or not before_kg:
+        return 1.0
+    return calculate_carbon(*scenario) / before_kg
+
+
+def simulate(
+    db: Session, user_id: int, substitutions: List[schemas.Substitution]
+) -> dict:
+    """
+    Re-score the user's whole history with and without the substitutions.
+
+    Rows are collapsed in the database to one group per (month, activity,
+    typed detail columns), so each distinct entry shape is scored once and
+    multiplied by its count, whatever the length of the history.
+
+    Archived months only have daily totals per activity. Their before figure
+    is exact, but the after figure is an estimate (see _archive_ratio) and
+    such months are flagged `estimated`.
+    """
+    _validate(substitutions)
+
+    month = month_label(db, models.Footprint.entry_date).label("month")
+    detail_columns = [
+        getattr(models.Footprint, column) for column in models.DETAIL_COLUMNS.values()
+    ]
+    groups = (
+        db.query(
+            month,
+            models.Footprint.activity_type,
+            *detail_columns,
+            func.count(models.Footprint.id).label("entry_count"),
+        )
+        .filter(models.Footprint.user_id == user_id)
+        .group_by("month", models.Footprint.activity_type, *detail_columns)
+        .all()
+    )
+
+    scores: Dict[Tuple, Tuple[float, float]] = {}
+    before = defaultdict(float)
+    after = defaultdict(float)
+    for group in groups:
+        details = models.details_from_columns(group)
+        key = (group.activity_type, *sorted(details.items()))
+        if key not in scores:
+            scenario = apply_substitutions(substitutions, group.activity_type, details)
+            scores[key] = (
+                calculate_carbon(group.activity_type, details),
+                calculate_carbon(*scenario) if scenario else 0.0,
+            )
+
+        before_kg, after_kg = scores[key]
+        before[group.month] += before_kg * group.entry_count
+        after[group.month] += after_kg * group.entry_count
+
+    archive_month = month_label(db, models.FootprintArchive.entry_date).label("month")
+    archived = (
+        db.query(
+            archive_month,
+            models.FootprintArchive.activity_type,
+            func.sum(models.FootprintArchive.carbon_kg).label("carbon_kg"),
+        )
+        .filter(models.FootprintArchive.user_id == user_id)
+        .group_by("month", models.FootprintArchive.activity_type)
+        .all()
+    )
+    ratios: Dict[str, float] = {}
+    estimated = set()
+    for group in archived:
+        if group.activity_type not in ratios:
+            ratios[group.activity_type] = _archive_ratio(
+                substitutions, group.activity_type
+            )
+        before[group.month] += group.carbon_kg
+        after[group.month] += group.carbon_kg * ratios[group.activity_type]
+        estimated.add(group.month)
+
+    months = [
+        {
+            "month": month,
+            "before_kg": round(before[month], 1),
+            "after_kg": round(after[month], 1),
+            "estimated": month in estimated,
+        }
+        for month in sorted(before)
+    ]
+    before_kg = round(sum(before.values()), 1)
+    after_kg = round(sum(after.values()), 1)
+    return {
+        "before_kg": before_kg,
+        "after_kg": after_kg,
+        "saved_kg": round(before_kg - after_kg, 1),
+        "months": months,
+    }
@@ -0,0 +1,103 @@
+import math
+from typing import Dict, Optional
+
+# Values are bucketed on a log scale so that any two values sharing a bucket
+# are within RELATIVE_ERROR of each other (the DDSketch construction). The
+# sketch is mergeable and, unlike t-digest/KLL, supports exact removal,
+# which we need because a user's monthly total moves on every write.
+RELATIVE_ERROR = 0.01
+MIN_VALUE = 0.01  # kg; anything at or below this counts as zero
+
+_GAMMA = (1 + RELATIVE_ERROR) / (1 - RELATIVE_ERROR)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def bucket_key(value: float) -> Optional[int]:
+    if value <= MIN_VALUE:
+        return None
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch over non-negative values.
+    """
+
+    def __init__(self, zero_count: int = 0, bins: Optional[Dict[int, int]] = None):
+        self.zero_count = zero_count
+        self.bins = dict(bins or {})
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value: float, count: int = 1):
+        key = bucket_key(value)
+        if key is None:
+            self.zero_count += count
+        else:
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def remove(self, value: float, count: int = 1):
+        key = bucket_key(value)
+        if key is None:
+            self.zero_count = max(0, self.zero_count - count)
+            return
+        remaining = self.bins.get(key, 0) - count
+        if remaining > 0:
+            self.bins[key] = remaining
+        else:
+            self.bins.pop(key, None)
+
+    def merge(self, other: "QuantileSketch"):
+        self.zero_count += other.zero_count
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def rank(self, value: float) -> float:
+        """
+        Fraction of values at or below `value`, counting values that share its
+        bucket as half below and half above.
+        """
+        total = self.count
+        if total == 0:
+            return 0.0
+
+        key = bucket_key(value)
+        if key is None:
+            return (self.zero_count / 2) / total
+
+        below = self.zero_count + sum(c for k, c in self.bins.items() if k < key)
+        return (below + self.bins.get(key, 0) / 2) / total
+
+    def quantile(self, q: float) -> float:
+        total = self.count
+        if total == 0:
+            return 0.0
+
+        target = q * (total - 1)
+        seen = self.zero_count
+        if target < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if target < seen:
+                # Midpoint of the bucket, which is within RELATIVE_ERROR of
+                # every value that landed in it.
+                return 2 * _GAMMA**key / (_GAMMA + 1)
+        return 2 * _GAMMA ** max(self.bins) / (_GAMMA + 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "zero_count": self.zero_count,
+            "bins": {str(k): c for k, c in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "QuantileSketch":
+        if not data:
+            return cls()
+        return cls(
+            zero_count=data.get("zero_count", 0),
+            bins={int(k): c for k, c in data.get("bins", {}).items()},
+        )
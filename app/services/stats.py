@@ -0,0 +1,416 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import func, union
+from sqlalchemy.orm import Session
+from .. import models
+
+# activity_type -> [carbon_kg, entry_count]
+ActivityTotals = Dict[str, list]
+
+# (first day, last day) of a run of consecutive entry days
+Run = Tuple[date, date]
+
+# Stored totals are rounded to grams
+TOLERANCE_KG = 0.001
+
+
+def _day(value) -> Optional[date]:
+    if value is None or type(value) is date:
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(str(value)[:10])
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+def _entry_days(
+    db: Session, user_id: int, excluded=None, excluded_archive=None
+) -> Iterator[date]:
+    """
+    Distinct days the user has entries on, newest first, including archived
+    months. Footprints matched by the `excluded` query and archive rows
+    matched by `excluded_archive` are left out.
+    """
+    live = db.query(
+        func.date(models.Footprint.entry_date).label("entry_day")
+    ).filter(models.Footprint.user_id == user_id)
+    if excluded is not None:
+        live = live.filter(
+            ~models.Footprint.id.in_(
+                excluded.with_entities(models.Footprint.id).statement
+            )
+        )
+    archived = db.query(
+        func.date(models.FootprintArchive.entry_date).label("entry_day")
+    ).filter(models.FootprintArchive.user_id == user_id)
+    if excluded_archive is not None:
+        archived = archived.filter(
+            ~models.FootprintArchive.id.in_(
+                excluded_archive.with_entities(models.FootprintArchive.id).statement
+            )
+        )
+    days = union(live.statement, archived.statement).subquery()
+    rows = db.query(days.c.entry_day).order_by(days.c.entry_day.desc())
+    return (_day(row.entry_day) for row in rows.yield_per(500))
+
+
+def _runs(days: Iterable[date], today: date) -> List[Run]:
+    """
+    Runs of consecutive days in `days` (distinct, newest first), newest
+    first, down to the newest run that starts on or before `today`. Older
+    runs can never be the current streak again, so they aren't read.
+    """
+    runs: List[Run] = []
+    for day in days:
+        if runs and day == runs[-1][0] - timedelta(days=1):
+            runs[-1] = (day, runs[-1][1])
+            continue
+        if runs and runs[-1][0] <= today:
+            break
+        runs.append((day, day))
+    return runs
+
+
+def _trim(runs: List[Run], today: date) -> List[Run]:
+    for index, (start, _) in enumerate(runs):
+        if start <= today:
+            return runs[: index + 1]
+    return runs
+
+
+def _add_day(runs: List[Run], day: date) -> bool:
+    """
+    Add `day` to `runs` in place. Returns False if it extends the oldest
+    run kept backwards, as it may then join an older run that wasn't.
+    """
+    one_day = timedelta(days=1)
+    for index, (start, last) in enumerate(runs):
+        if day > last + one_day:
+            runs.insert(index, (day, day))
+            return True
+        if day == last + one_day:
+            runs[index] = (start, day)
+            return True
+        if day >= start:
+            return True
+        if day == start - one_day:
+            if index == len(runs) - 1:
+                return False
+            older_start, older_last = runs[index + 1]
+            if older_last == day - one_day:
+                runs[index : index + 2] = [(older_start, last)]
+            else:
+                runs[index] = (day, last)
+            return True
+    # Older than every run kept: _trim drops it again unless the runs kept
+    # are all there are
+    runs.append((day, day))
+    return True
+
+
+def _stored_runs(stats: models.UserStats) -> Optional[List[Run]]:
+    if stats.runs is None:
+        return None
+    return [
+        (date.fromisoformat(start), date.fromisoformat(last))
+        for start, last in stats.runs
+    ]
+
+
+def _store_runs(stats: models.UserStats, runs: List[Run]):
+    stats.runs = [[start.isoformat(), last.isoformat()] for start, last in runs]
+    if runs:
+        stats.streak_start, stats.last_entry_date = runs[0]
+        stats.streak_days = (runs[0][1] - runs[0][0]).days + 1
+    else:
+        stats.last_entry_date = stats.streak_start = None
+        stats.streak_days = 0
+
+
+def _set_runs(stats: models.UserStats, days: Iterable[date]):
+    _store_runs(stats, _runs(days, _today()))
+
+
+def _raw_totals(
+    db: Session, user_id: Optional[int] = None
+) -> Dict[int, ActivityTotals]:
+    """
+    Lifetime per-activity totals straight from the live and archived rows,
+    for one user or for everyone.
+    """
+    by_user: Dict[int, ActivityTotals] = defaultdict(dict)
+    sources = (
+        (models.Footprint, func.count(models.Footprint.id)),
+        (models.FootprintArchive, func.sum(models.FootprintArchive.entry_count)),
+    )
+    for model, entry_count in sources:
+        query = db.query(
+            model.user_id,
+            model.activity_type,
+            func.sum(model.carbon_kg).label("carbon_kg"),
+            entry_count.label("entry_count"),
+        ).group_by(model.user_id, model.activity_type)
+        if user_id is not None:
+            query = query.filter(model.user_id == user_id)
+        for row in query:
+            entry = by_user[row.user_id].setdefault(row.activity_type, [0.0, 0])
+            entry[0] += row.carbon_kg
+            entry[1] += row.entry_count
+    return by_user
+
+
+def _fill(stats: models.UserStats, totals: ActivityTotals, days: Iterable[date]):
+    stats.activity_totals = {
+        activity_type: round(carbon_kg, 3)
+        for activity_type, (carbon_kg, _) in totals.items()
+        if round(carbon_kg, 3) > 0
+    }
+    stats.carbon_kg = round(sum(carbon_kg for carbon_kg, _ in totals.values()), 3)
+    stats.entry_count = sum(count for _, count in totals.values())
+    _set_runs(stats, days)
+
+
+def _load(db: Session, user_id: int) -> Tuple[models.UserStats, bool]:
+    """
+    Lock the user's stats row. If there is none yet it is built from the rows
+    already stored, which include the write in progress; the second value
+    says so.
+    """
+    stats = (
+        db.query(models.UserStats)
+        .filter_by(user_id=user_id)
+        .with_for_update()
+        .first()
+    )
+    if stats is not None:
+        return stats, False
+
+    stats = models.UserStats(user_id=user_id)
+    _fill(stats, _raw_totals(db, user_id).get(user_id, {}), _entry_days(db, user_id))
+    db.add(stats)
+    # Insert now: a concurrent first write waits on the key like on the lock
+    db.flush()
+    return stats, True
+
+
+def lock(db: Session, user_ids: Iterable[int]):
+    """
+    Lock the stats rows of `user_ids`, creating any that are missing, in id
+    order so that multi-user writers can't deadlock. Every write to the
+    change feed takes this lock first; see changes.py.
+    """
+    for user_id in sorted(set(user_ids)):
+        _load(db, user_id)
+
+
+def _apply(stats: models.UserStats, totals: ActivityTotals, sign: int):
+    activity_totals = dict(stats.activity_totals or {})
+    for activity_type, (carbon_kg, _) in totals.items():
+        total = round(activity_totals.get(activity_type, 0.0) + sign * carbon_kg, 3)
+        if total > 0:
+            activity_totals[activity_type] = total
+        else:
+            activity_totals.pop(activity_type, None)
+    stats.activity_totals = activity_totals
+
+    carbon_kg = sum(carbon_kg for carbon_kg, _ in totals.values())
+    count = sum(count for _, count in totals.values())
+    stats.carbon_kg = round(max(0.0, stats.carbon_kg + sign * carbon_kg), 3)
+    stats.entry_count = max(0, stats.entry_count + sign * count)
+
+
+def record_added(
+    db: Session, user_id: int, totals: ActivityTotals, entry_dates: Iterable
+):
+    """
+    Must be called after the new rows are flushed.
+    """
+    stats, fresh = _load(db, user_id)
+    if fresh:
+        return
+
+    _apply(stats, totals, 1)
+    runs = _stored_runs(stats)
+    if runs is not None and all(
+        _add_day(runs, day) for day in sorted({_day(value) for value in entry_dates})
+    ):
+        _store_runs(stats, _trim(runs, _today()))
+    else:
+        # The rows are flushed, so the recount covers the rest of the batch
+        _set_runs(stats, _entry_days(db, user_id))
+
+
+def record_removed(
+    db: Session,
+    user_id: int,
+    totals: ActivityTotals,
+    query,
+    model=models.Footprint,
+):
+    """
+    Must be called before `query`, over footprints or, with `model`, over
+    footprint_archive, is used to delete the rows.
+    """
+    stats, _ = _load(db, user_id)
+    _apply(stats, totals, -1)
+
+    # Deleting days older than every run kept can't change them
+    runs = _stored_runs(stats)
+    if runs == []:
+        return
+    if runs is not None:
+        touches_runs = (
+            query.with_entities(model.id)
+            .filter(func.date(model.entry_date) >= runs[-1][0])
+            .first()
+        )
+        if touches_runs is None:
+            return
+    if model is models.FootprintArchive:
+        days = _entry_days(db, user_id, excluded_archive=query)
+    else:
+        days = _entry_days(db, user_id, excluded=query)
+    _set_runs(stats, days)
+
+
+def _streak_as_of(
+    db: Session, stats: models.UserStats, today: date
+) -> Tuple[Optional[date], int]:
+    """
+    Latest entry day up to `today` and the length of the run ending there.
+    Runs can reach into the future through recurring entries; that part
+    doesn't count yet.
+    """
+    runs = _stored_runs(stats)
+    if runs is None:
+        # Not yet filled in by reconcile
+        runs = _runs(_entry_days(db, stats.user_id), today)
+    for start, last in runs:
+        if start <= today:
+            last = min(last, today)
+            return last, (last - start).days + 1
+    return None, 0
+
+
+def summary(db: Session, user_id: int, today: Optional[date] = None) -> dict:
+    # rollups imports this module
+    from .rollups import ALL_ACTIVITIES
+
+    today = today or datetime.utcnow().date()
+    stats = db.get(models.UserStats, user_id)
+    this_month = db.get(
+        models.UserMonthlyTotal,
+        (user_id, date(today.year, today.month, 1), ALL_ACTIVITIES),
+    )
+    if stats is None:
+        return {
+            "lifetime_kg": 0.0,
+            "entry_count": 0,
+            "this_month_kg": this_month.carbon_kg if this_month else 0.0,
+            "top_activity": None,
+            "last_entry_date": None,
+            "current_streak_days": 0,
+        }
+
+    activity_totals = stats.activity_totals or {}
+    top_activity = (
+        max(activity_totals, key=activity_totals.get) if activity_totals else None
+    )
+    last_entry_date, streak_days = _streak_as_of(db, stats, today)
+    # A streak that ended before yesterday has been broken
+    is_current = last_entry_date is not None and (
+        last_entry_date >= today - timedelta(days=1)
+    )
+    return {
+        "lifetime_kg": stats.carbon_kg,
+        "entry_count": stats.entry_count,
+        "this_month_kg": this_month.carbon_kg if this_month else 0.0,
+        "top_activity": top_activity,
+        "last_entry_date": last_entry_date,
+        "current_streak_days": streak_days if is_current else 0,
+    }
+
+
+def _matches(stats: models.UserStats, expected: models.UserStats) -> bool:
+    stored = stats.activity_totals or {}
+    if set(stored) != set(expected.activity_totals):
+        return False
+    return (
+        abs(stats.carbon_kg - expected.carbon_kg) <= TOLERANCE_KG
+        and stats.entry_count == expected.entry_count
+        and all(
+            abs(stored[activity_type] - carbon_kg) <= TOLERANCE_KG
+            for activity_type, carbon_kg in expected.activity_totals.items()
+        )
+        and stats.last_entry_date == expected.last_entry_date
+        and stats.streak_start == expected.streak_start
+        and stats.streak_days == expected.streak_days
+        # Runs kept since an earlier write may reach further back
+        and stats.runs is not None
+        and _trim(_stored_runs(stats), _today()) == _stored_runs(expected)
+    )
+
+
+def reconcile(db: Session, repair: bool = True) -> List[int]:
+    """
+    Check every user's stats against the live and archived rows and return
+    the ids of users whose stats had drifted (or were missing), fixing them
+    unless `repair` is False. Each user is checked with their stats row
+    locked, so concurrent writes are neither missed nor counted twice.
+    """
+    user_ids = set(_raw_totals(db)) | {
+        row.user_id for row in db.query(models.UserStats.user_id)
+    }
+    db.rollback()
+
+    drifted = []
+    for user_id in sorted(user_ids):
+        stats = (
+            db.query(models.UserStats)
+            .filter_by(user_id=user_id)
+            .with_for_update()
+            .first()
+        )
+        expected = models.UserStats(user_id=user_id)
+        _fill(
+            expected,
+            _raw_totals(db, user_id).get(user_id, {}),
+            _entry_days(db, user_id),
+        )
+        if stats is not None and _matches(stats, expected):
+            db.rollback()
+            continue
+
+        drifted.append(user_id)
+        if not repair:
+            db.rollback()
+            continue
+        if stats is None:
+            db.add(expected)
+        else:
+            for column in (
+                "carbon_kg",
+                "entry_count",
+                "activity_totals",
+                "last_entry_date",
+                "streak_start",
+                "streak_days",
+                "runs",
+            ):
+                setattr(stats, column, getattr(expected, column))
+        db.commit()
+    return drifted
+
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(reconcile(session))
+    finally:
+        session.close()
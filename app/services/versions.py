@@ -0,0 +1,91 @@
+import hashlib
+from typing import Iterable, Optional
+from fastapi import Request, Response
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import insert_ignore
+
+GLOBAL_SCOPE = "global"
+# The global version is the sum of this many counters, each bumped by the
+# users it is picked for, so that writes for different users rarely wait on
+# the same row. A plain "global" row, if present, is counted in too.
+GLOBAL_SHARDS = 16
+
+
+def user_scope(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def _global_shard(user_id: int) -> str:
+    return f"{GLOBAL_SCOPE}:{user_id % GLOBAL_SHARDS}"
+
+
+def _increment(db: Session, scope: str):
+    query = db.query(models.DataVersion).filter_by(scope=scope)
+    increment = {models.DataVersion.version: models.DataVersion.version + 1}
+    if not query.update(increment, synchronize_session=False):
+        # First bump of this scope; a concurrent first bump may beat us to it
+        insert_ignore(db, models.DataVersion, scope=scope, version=0)
+        query.update(increment, synchronize_session=False)
+
+
+def lock(db: Session, user_ids: Iterable[int]):
+    """
+    Lock the global counters that bumps for `user_ids` will touch, in one
+    order. Writers covering more than one user call this before bumping.
+    """
+    for scope in sorted({_global_shard(user_id) for user_id in user_ids}):
+        query = db.query(models.DataVersion).filter_by(scope=scope).with_for_update()
+        if query.first() is None:
+            insert_ignore(db, models.DataVersion, scope=scope, version=0)
+            query.first()
+
+
+def bump(db: Session, user_id: int):
+    """
+    Advance the user's and the global footprint version. Runs inside the
+    caller's transaction so the new version and the write commit together.
+    """
+    _increment(db, user_scope(user_id))
+    _increment(db, _global_shard(user_id))
+    db.flush()
+
+
+def current(db: Session, scope: str) -> int:
+    if scope == GLOBAL_SCOPE:
+        total = (
+            db.query(func.sum(models.DataVersion.version))
+            .filter(
+                or_(
+                    models.DataVersion.scope == GLOBAL_SCOPE,
+                    models.DataVersion.scope.like(f"{GLOBAL_SCOPE}:%"),
+                )
+            )
+            .scalar()
+        )
+        return total or 0
+    row = db.get(models.DataVersion, scope)
+    return row.version if row else 0
+
+
+def etag(scope: str, version: int, request: Request) -> str:
+    # Different filters over the same data need different tags
+    params = hashlib.sha1(str(request.url.query).encode()).hexdigest()[:12]
+    return f'W/"{scope}.{version}.{params}"'
+
+
+def not_modified(request: Request, response: Response, tag: str) -> Optional[Response]:
+    """
+    Set the ETag on `response`, and return a 304 if the client already has
+    this version.
+    """
+    headers = {"ETag": tag, "Cache-Control": "private, no-cache"}
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {value.strip() for value in if_none_match.split(",")}
+        if tag in candidates or "*" in candidates:
+            return Response(status_code=304, headers=headers)
+    return None
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Point the app at a throwaway database before any app module is imported
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+)
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+# Ensure the 'app' package can be found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def db_schema():
+    from app import models
+    from app.database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    yield
+    models.Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def db(db_schema):
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    from app import models
+
+    db_user = models.User(
+        username="tester", email="tester@example.com", hashed_password="x"
+    )
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+
+@pytest.fixture
+def client(db_schema):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers(user):
+    from app import auth
+
+    token = auth.create_access_token({"sub": str(user.id)})
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+from app import models
+from app.services import changes
+
+
+def _post(client, headers, activity_type="bus"):
+    return client.post(
+        "/footprints/",
+        json={
+            "activity_type": activity_type,
+            "details": {},
+            "entry_date": datetime(2026, 6, 1).isoformat(),
+        },
+        headers=headers,
+    ).json()
+
+
+def _changes(client, headers, since, **params):
+    return client.get(
+        "/footprints/changes", params={"since": since, **params}, headers=headers
+    )
+
+
+def test_feed_returns_upserts_then_tombstones(client, auth_headers):
+    first = _post(client, auth_headers)
+    cursor = int(
+        client.get("/footprints/self", headers=auth_headers).headers["x-change-cursor"]
+    )
+
+    second = _post(client, auth_headers, "meat")
+    page = _changes(client, auth_headers, cursor).json()
+    assert [f["id"] for f in page["upserts"]] == [second["id"]]
+    assert page["deletes"] == []
+
+    client.delete("/footprints/bulk", headers=auth_headers)
+    page = _changes(client, auth_headers, page["cursor"]).json()
+    assert page["upserts"] == []
+    assert sorted(page["deletes"]) == sorted([first["id"], second["id"]])
+    assert _changes(client, auth_headers, page["cursor"]).json()["deletes"] == []
+
+
+def test_feed_pages_with_has_more(client, auth_headers):
+    for _ in range(3):
+        _post(client, auth_headers)
+    page = _changes(client, auth_headers, 0, limit=2).json()
+    assert page["has_more"] is True
+    page = _changes(client, auth_headers, page["cursor"], limit=2).json()
+    assert page["has_more"] is False
+    assert len(page["upserts"]) == 1
+
+
+def test_pruned_cursor_is_gone(client, db, auth_headers):
+    _post(client, auth_headers)
+    _post(client, auth_headers)
+    db.query(models.FootprintChange).update(
+        {models.FootprintChange.changed_at: datetime.utcnow() - timedelta(days=90)}
+    )
+    db.commit()
+
+    assert changes.prune(db) == 2
+    assert _changes(client, auth_headers, 1).status_code == 410
+    # A fresh client has to resync too, and the cursor it gets back works
+    assert _changes(client, auth_headers, 0).status_code == 410
+    cursor = client.get("/footprints/self", headers=auth_headers).headers[
+        "x-change-cursor"
+    ]
+    assert _changes(client, auth_headers, cursor).status_code == 200
+
+
+def test_idle_user_keeps_their_cursor_across_prunes(client, db, user, auth_headers):
+    from app.auth import create_access_token
+
+    _post(client, auth_headers)
+    cursor = _changes(client, auth_headers, 0).json()["cursor"]
+
+    other = models.User(username="other", email="o@e.com", hashed_password="x")
+    db.add(other)
+    db.commit()
+    other_headers = {
+        "Authorization": f"Bearer {create_access_token({'sub': str(other.id)})}"
+    }
+    for _ in range(2):
+        db.query(models.FootprintChange).update(
+            {models.FootprintChange.changed_at: datetime.utcnow() - timedelta(days=90)}
+        )
+        db.commit()
+        changes.prune(db)
+        # Someone else keeps writing; our user has nothing new
+        _post(client, other_headers)
+
+    page = _changes(client, auth_headers, cursor)
+    assert page.status_code == 200
+    assert page.json()["cursor"] == cursor
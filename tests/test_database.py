@@ -0,0 +1,103 @@
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+from app import database, models
+
+
+@pytest.fixture
+def replica(db_schema, monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(), "replica.db")
+    replica_engine = database.make_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=replica_engine)
+    monkeypatch.setattr(database, "replica_engines", [replica_engine])
+    monkeypatch.setattr(database, "_last_write_at", {})
+    yield replica_engine
+    replica_engine.dispose()
+
+
+def test_read_engine_without_replicas_is_primary():
+    assert database.read_engine(1) is database.engine
+
+
+def test_read_engine_sticks_to_primary_after_write(replica):
+    assert database.read_engine(1) is replica
+    database.note_write(1)
+    assert database.read_engine(1) is database.engine
+    assert database.read_engine(2) is replica
+
+
+def test_lagging_replica_is_skipped(replica, monkeypatch):
+    monkeypatch.setattr(database, "_measure_lag", lambda engine: 60.0)
+    monkeypatch.setattr(database, "_replica_lag", {})
+    assert database.read_engine(1) is database.engine
+
+
+def _copy_user(replica, user):
+    with replica.begin() as conn:
+        conn.execute(
+            models.User.__table__.insert(),
+            {
+                "id": user.id,
+                "username": "tester",
+                "email": "t@e.com",
+                "hashed_password": "x",
+            },
+        )
+
+
+def test_reads_follow_routing(replica, client, user, auth_headers):
+    _copy_user(replica, user)
+    client.post(
+        "/footprints/",
+        json={
+            "activity_type": "bus",
+            "details": {},
+            "entry_date": datetime.utcnow().isoformat(),
+        },
+        headers=auth_headers,
+    )
+    # Right after the write the user reads their own data from the primary
+    assert len(client.get("/footprints/self", headers=auth_headers).json()) == 1
+
+    database._last_write_at.clear()
+    # Once the stickiness lapses reads go to the (empty) replica
+    assert client.get("/footprints/self", headers=auth_headers).json() == []
+
+
+def test_write_marker_pins_reads_on_any_worker(replica, client, user, auth_headers):
+    _copy_user(replica, user)
+    response = client.post(
+        "/footprints/",
+        json={
+            "activity_type": "bus",
+            "details": {},
+            "entry_date": datetime.utcnow().isoformat(),
+        },
+        headers=auth_headers,
+    )
+    marker = response.headers[database.LAST_WRITE_HEADER]
+    # Another worker has never seen this user write
+    database._last_write_at.clear()
+
+    pinned = {**auth_headers, database.LAST_WRITE_HEADER: marker}
+    assert len(client.get("/footprints/self", headers=pinned).json()) == 1
+
+    payload, _, _ = marker.rpartition(".")
+    forged = {**auth_headers, database.LAST_WRITE_HEADER: f"{payload}.{'0' * 32}"}
+    assert client.get("/footprints/self", headers=forged).json() == []
+
+    other_user = database.write_marker(user.id + 1, float(payload.split(".", 1)[1]))
+    other = {**auth_headers, database.LAST_WRITE_HEADER: other_user}
+    assert client.get("/footprints/self", headers=other).json() == []
+
+
+def test_stale_stickiness_is_swept(replica, monkeypatch):
+    monkeypatch.setattr(database, "_SWEEP_AT", 2)
+    for user_id in range(3):
+        database.note_write(user_id)
+    database._last_write_at.update({0: 0.0, 1: 0.0})
+    database.note_write(3)
+    assert set(database._last_write_at) == {2, 3}
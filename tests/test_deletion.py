@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+from app import models
+from app.services.deletion import run_deletion_job
+from app.services import rollups
+
+
+def _add_footprints(db, user, activity_type, days):
+    footprints = [
+        models.Footprint(
+            activity_type=activity_type,
+            carbon_kg=1.0,
+            user_id=user.id,
+            entry_date=datetime(2026, 3, 1) + timedelta(days=day),
+        )
+        for day in range(days)
+    ]
+    db.add_all(footprints)
+    rollups.record_added(db, user.id, footprints)
+    db.commit()
+
+
+def test_deletion_job_is_scoped_and_chunked(db, user):
+    _add_footprints(db, user, "bus", 10)
+    _add_footprints(db, user, "meat", 3)
+    job = models.DeletionJob(
+        user_id=user.id,
+        activity_type="bus",
+        start=datetime(2026, 3, 3),
+        end=datetime(2026, 3, 8),
+    )
+    db.add(job)
+    db.commit()
+
+    run_deletion_job(job.id, chunk_size=2)
+
+    db.refresh(job)
+    assert job.status == "done"
+    assert job.deleted_count == 5
+    assert job.finished_at is not None
+    remaining = db.query(models.Footprint).filter_by(activity_type="bus").count()
+    assert remaining == 5
+    assert db.query(models.Footprint).filter_by(activity_type="meat").count() == 3
+    overall = (
+        db.query(models.UserMonthlyTotal)
+        .filter_by(user_id=user.id, activity_type=rollups.ALL_ACTIVITIES)
+        .one()
+    )
+    assert (overall.carbon_kg, overall.entry_count) == (8.0, 8)
+
+
+def test_bulk_delete_runs_in_background(client, auth_headers):
+    for _ in range(3):
+        client.post(
+            "/footprints/",
+            json={
+                "activity_type": "bus",
+                "details": {},
+                "entry_date": datetime(2026, 5, 1).isoformat(),
+            },
+            headers=auth_headers,
+        )
+
+    response = client.delete("/footprints/bulk", headers=auth_headers)
+    assert response.status_code == 202
+
+    job = client.get(
+        f"/footprints/jobs/{response.json()['job_id']}", headers=auth_headers
+    ).json()
+    assert job["status"] == "done"
+    assert job["deleted_count"] == 3
+    assert client.get("/footprints/self", headers=auth_headers).json() == []
+
+
+def test_deletion_covers_archived_months(db, user):
+    from app.services import stats
+    from app.services.partitions import archive_month
+
+    _add_footprints(db, user, "bus", 3)
+    archive_month(db, datetime(2026, 3, 1).date())
+    _add_footprints(db, user, "meat", 2)
+    job = models.DeletionJob(user_id=user.id)
+    db.add(job)
+    db.commit()
+
+    run_deletion_job(job.id)
+
+    db.expire_all()
+    assert db.get(models.DeletionJob, job.id).deleted_count == 5
+    assert db.query(models.FootprintArchive).count() == 0
+    totals = db.query(models.UserMonthlyTotal).filter_by(user_id=user.id).all()
+    assert all(t.entry_count == 0 and t.carbon_kg == 0 for t in totals)
+    user_stats = db.get(models.UserStats, user.id)
+    assert (user_stats.entry_count, user_stats.streak_days) == (0, 0)
+    assert stats.reconcile(db) == []
+
+
+def test_archived_days_partly_in_range_are_kept(db, user):
+    from app.services.partitions import archive_month
+
+    _add_footprints(db, user, "bus", 5)
+    archive_month(db, datetime(2026, 3, 1).date())
+    job = models.DeletionJob(
+        user_id=user.id,
+        start=datetime(2026, 3, 2, 6),
+        end=datetime(2026, 3, 5, 12),
+    )
+    db.add(job)
+    db.commit()
+
+    run_deletion_job(job.id)
+
+    db.expire_all()
+    assert db.get(models.DeletionJob, job.id).deleted_count == 2
+    kept = sorted(row.entry_date.day for row in db.query(models.FootprintArchive))
+    assert kept == [1, 2, 5]
+
+
+def test_abandoned_jobs_are_failed(db, user):
+    from app.services.deletion import fail_abandoned_jobs
+
+    stale = datetime.utcnow() - timedelta(hours=1)
+    abandoned = models.DeletionJob(
+        user_id=user.id, status="running", created_at=stale, heartbeat_at=stale
+    )
+    live = models.DeletionJob(user_id=user.id, status="running")
+    db.add_all([abandoned, live])
+    db.commit()
+
+    assert fail_abandoned_jobs(db) == 1
+    db.expire_all()
+    assert (abandoned.status, live.status) == ("failed", "running")
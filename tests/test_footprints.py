@@ -0,0 +1,156 @@
+from datetime import datetime
+
+from app import models
+from app.services import versions
+
+
+def _post(client, headers, activity_type, details):
+    return client.post(
+        "/footprints/",
+        json={
+            "activity_type": activity_type,
+            "details": details,
+            "entry_date": datetime(2026, 6, 1).isoformat(),
+        },
+        headers=headers,
+    )
+
+
+def test_details_are_projected_into_typed_columns():
+    footprint = models.Footprint(
+        details={"type": "beef", "servings_per_week": "3", "note": "ignored"}
+    )
+    assert footprint.item_type == "beef"
+    assert footprint.servings_per_week == 3.0
+    assert footprint.fuel_type is None
+    assert models.details_from_columns(footprint) == {
+        "type": "beef",
+        "servings_per_week": 3.0,
+    }
+
+
+def test_self_filters_on_typed_columns(client, auth_headers):
+    _post(client, auth_headers, "driving", {"commute": "long", "fuel_type": "petrol"})
+    _post(client, auth_headers, "driving", {"commute": "long", "fuel_type": "other"})
+    _post(client, auth_headers, "meat", {"type": "beef", "servings_per_week": 2})
+
+    petrol = client.get(
+        "/footprints/self", params={"fuel_type": "petrol"}, headers=auth_headers
+    ).json()
+    beef = client.get(
+        "/footprints/self", params={"type": "beef"}, headers=auth_headers
+    ).json()
+
+    assert [f["details"]["fuel_type"] for f in petrol] == ["petrol"]
+    assert [f["activity_type"] for f in beef] == ["meat"]
+
+
+def test_compact_encoding_round_trips_and_sums_exactly(db, user):
+    from sqlalchemy import func, text
+
+    db.add_all(
+        models.Footprint(
+            activity_type="bus",
+            carbon_kg=0.1,
+            user_id=user.id,
+            entry_date=datetime(2026, 6, 1),
+            recurrence_frequency="weekday",
+        )
+        for _ in range(10)
+    )
+    db.commit()
+
+    raw = db.execute(
+        text("SELECT activity_type, recurrence_frequency, carbon_g FROM footprints")
+    ).first()
+    assert tuple(raw) == (5, 2, 100)
+    footprint = db.query(models.Footprint).first()
+    assert (footprint.activity_type, footprint.recurrence_frequency) == ("bus", "weekday")
+    assert db.query(func.sum(models.Footprint.carbon_kg)).scalar() == 1.0
+
+
+def test_self_answers_if_none_match_with_304(client, auth_headers):
+    _post(client, auth_headers, "bus", {})
+    first = client.get("/footprints/self", headers=auth_headers)
+    tag = first.headers["etag"]
+
+    cached = client.get(
+        "/footprints/self", headers={**auth_headers, "If-None-Match": tag}
+    )
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    filtered = client.get(
+        "/footprints/self",
+        params={"activity_type": "bus"},
+        headers={**auth_headers, "If-None-Match": tag},
+    )
+    assert filtered.status_code == 200
+
+    _post(client, auth_headers, "bus", {})
+    changed = client.get(
+        "/footprints/self", headers={**auth_headers, "If-None-Match": tag}
+    )
+    assert changed.status_code == 200
+    assert len(changed.json()) == 2
+    assert changed.headers["etag"] != tag
+
+
+def test_all_etag_follows_global_version(client, auth_headers):
+    tag = client.get("/footprints/all", headers=auth_headers).headers["etag"]
+    assert (
+        client.get(
+            "/footprints/all", headers={**auth_headers, "If-None-Match": tag}
+        ).status_code
+        == 304
+    )
+    _post(client, auth_headers, "bus", {})
+    assert (
+        client.get(
+            "/footprints/all", headers={**auth_headers, "If-None-Match": tag}
+        ).status_code
+        == 200
+    )
+
+
+def test_global_version_is_summed_over_shards(db):
+    # The pre-sharding counter still counts
+    db.add(models.DataVersion(scope=versions.GLOBAL_SCOPE, version=5))
+    db.commit()
+    for user_id in (1, 2, 1 + versions.GLOBAL_SHARDS):
+        versions.bump(db, user_id)
+    db.commit()
+
+    assert versions.current(db, versions.GLOBAL_SCOPE) == 8
+    assert versions.current(db, versions.user_scope(1)) == 1
+    shards = {
+        row.scope: row.version
+        for row in db.query(models.DataVersion).filter(
+            models.DataVersion.scope.like("global:%")
+        )
+    }
+    assert shards == {"global:1": 2, "global:2": 1}
+
+
+def test_all_only_shares_results_within_a_version(client, auth_headers, monkeypatch):
+    from app.routes import footprints
+
+    keys = []
+    real_do = footprints.aggregates.do
+
+    def recording_do(key, fn):
+        keys.append(key)
+        return real_do(key, fn)
+
+    monkeypatch.setattr(footprints.aggregates, "do", recording_do)
+    client.get("/footprints/all", headers=auth_headers)
+    _post(client, auth_headers, "bus", {})
+    client.get("/footprints/all", headers=auth_headers)
+    assert len(keys) == 2 and keys[0] != keys[1]
+
+
+def test_self_rejects_unknown_activity_filter(client, auth_headers):
+    response = client.get(
+        "/footprints/self", params={"activity_type": "nope"}, headers=auth_headers
+    )
+    assert response.status_code == 400
@@ -0,0 +1,111 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import models
+from app.database import SessionLocal
+from app.services import idempotency
+
+RECURRING = {
+    "activity_type": "bus",
+    "details": {},
+    "entry_date": datetime(2026, 6, 1).isoformat(),
+    "is_recurring": True,
+    "recurrence_frequency": "weekly",
+    "recurrence_end_date": datetime(2026, 7, 1).isoformat(),
+}
+
+
+def test_retry_replays_without_writing_again(client, auth_headers, db):
+    headers = {**auth_headers, "Idempotency-Key": "retry-1"}
+    first = client.post("/footprints/", json=RECURRING, headers=headers)
+    stored = db.query(models.Footprint).count()
+
+    retry = client.post("/footprints/", json=RECURRING, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers[idempotency.REPLAYED_HEADER] == "true"
+    assert retry.json() == first.json()
+    assert db.query(models.Footprint).count() == stored
+
+    bulk_headers = {**auth_headers, "Idempotency-Key": "bulk-1"}
+    batch = [{**RECURRING, "is_recurring": False}] * 3
+    first_bulk = client.post("/footprints/bulk", json=batch, headers=bulk_headers)
+    retry_bulk = client.post("/footprints/bulk", json=batch, headers=bulk_headers)
+    assert retry_bulk.json() == first_bulk.json()
+    assert db.query(models.Footprint).count() == stored + 3
+
+
+def test_key_reused_for_different_request_is_rejected(client, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "retry-2"}
+    client.post("/footprints/", json=RECURRING, headers=headers)
+    other = {**RECURRING, "activity_type": "meat"}
+    assert client.post("/footprints/", json=other, headers=headers).status_code == 422
+
+
+def test_duplicate_waits_for_the_first_request(db, user):
+    claim = idempotency.claim(db, user.id, "slow", "POST /footprints/", {})
+    assert claim.replay is None
+
+    def finish():
+        time.sleep(0.2)
+        session = SessionLocal()
+        idempotency.complete(session, claim, {"id": 7}, status_code=200)
+        session.commit()
+        session.close()
+
+    threading.Thread(target=finish).start()
+    other = SessionLocal()
+    try:
+        replay = idempotency.claim(other, user.id, "slow", "POST /footprints/", {})
+    finally:
+        other.close()
+    assert replay.replay.body == b'{"id":7}'
+
+
+def test_expired_keys_are_purged_and_reusable(db, user):
+    claim = idempotency.claim(db, user.id, "old", "POST /footprints/", {})
+    idempotency.complete(db, claim, {"id": 1})
+    db.query(models.IdempotencyKey).update(
+        {models.IdempotencyKey.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    claim = idempotency.claim(db, user.id, "old", "POST /footprints/", {"x": 1})
+    assert claim.replay is None
+    db.query(models.IdempotencyKey).update(
+        {models.IdempotencyKey.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+    assert idempotency.purge(db) == 1
+
+
+def test_rejected_request_does_not_hold_the_key(client, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "invalid-1"}
+    invalid = {**RECURRING, "activity_type": "nope"}
+    for _ in range(2):
+        response = client.post("/footprints/", json=invalid, headers=headers)
+        assert response.status_code == 400
+    response = client.post("/footprints/bulk", json=[invalid], headers=headers)
+    assert response.status_code == 400
+
+
+def test_request_that_outlives_its_lease_cannot_complete(db, user, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LEASE_SECONDS", 0)
+    slow = idempotency.claim(db, user.id, "lease", "POST /footprints/", {})
+    # The lease has run out, so a retry takes the key over
+    retry = idempotency.claim(db, user.id, "lease", "POST /footprints/", {})
+    assert retry.replay is None and retry.token != slow.token
+
+    with pytest.raises(HTTPException) as error:
+        idempotency.complete(db, slow, {"id": 1})
+    assert error.value.status_code == 409
+    db.rollback()
+    idempotency.release(db, slow)
+
+    idempotency.complete(db, retry, {"id": 2})
+    db.commit()
+    row = db.query(models.IdempotencyKey).one()
+    assert row.response == {"id": 2}
@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+import pytest
+
+from app import models
+from app.services.ingest import GroupCommitWriter
+
+
+def _footprint(user_id, carbon_kg=1.5):
+    return models.Footprint(
+        user_id=user_id,
+        activity_type="bus",
+        carbon_kg=carbon_kg,
+        details={},
+        entry_date=datetime(2026, 6, 1),
+    )
+
+
+def _write_concurrently(writer, footprints):
+    results, errors = [], []
+
+    def write(footprint):
+        try:
+            results.append(writer.write(footprint))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(f,)) for f in footprints]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_writes_share_one_commit(db, user):
+    writer = GroupCommitWriter(max_rows=10, max_wait_ms=500)
+    results, errors = _write_concurrently(
+        writer, [_footprint(user.id) for _ in range(10)]
+    )
+
+    assert errors == []
+    assert len({r.id for r in results}) == 10
+    assert writer.stats()["commits"] == 1
+    assert db.query(models.Footprint).count() == 10
+
+    month = datetime(2026, 6, 1).date()
+    total = db.get(models.UserMonthlyTotal, (user.id, month, "all"))
+    assert total.entry_count == 10
+    assert total.carbon_kg == pytest.approx(15.0)
+
+
+def test_bad_row_only_fails_its_own_request(db, user):
+    writer = GroupCommitWriter(max_rows=3, max_wait_ms=500)
+    results, errors = _write_concurrently(
+        writer,
+        [_footprint(user.id), _footprint(user.id, carbon_kg=None), _footprint(user.id)],
+    )
+
+    assert len(results) == 2 and len(errors) == 1
+    assert len({r.id for r in results}) == 2
+    assert writer.stats()["fallbacks"] == 1
+    assert db.query(models.Footprint).count() == 2
+
+
+def test_timed_out_write_is_not_committed(db, user, monkeypatch):
+    monkeypatch.setattr("app.services.ingest.GROUP_COMMIT_TIMEOUT_SECONDS", 0.05)
+    writer = GroupCommitWriter(max_rows=10, max_wait_ms=10)
+    # Hold the writer thread so the row stays queued past the timeout
+    release = threading.Event()
+    writer._next_group = lambda next_group=writer._next_group: (
+        release.wait(),
+        next_group(),
+    )[1]
+
+    with pytest.raises(FutureTimeoutError):
+        writer.write(_footprint(user.id))
+    release.set()
+
+    assert writer.write(_footprint(user.id, carbon_kg=2.0)).carbon_kg == 2.0
+    assert db.query(models.Footprint).count() == 1
+    assert writer.stats()["rows"] == 1
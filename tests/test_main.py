@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_healthz_does_not_need_database():
+    with TestClient(app) as client:
+        response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_readyz_waits_for_migrated_schema():
+    with TestClient(app) as client:
+        response = client.get("/readyz")
+    assert response.status_code == 503
+
+
+def test_readyz_reports_startup_time(db_schema):
+    with TestClient(app) as client:
+        response = client.get("/readyz")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert body["startup_seconds"] >= 0
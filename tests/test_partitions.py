@@ -0,0 +1,102 @@
+from datetime import date, datetime
+
+from app import models
+from app.services.partitions import add_months, archive_closed_periods
+
+
+def _footprint(user, entry_date, carbon_kg=10.0):
+    return models.Footprint(
+        activity_type="bus",
+        carbon_kg=carbon_kg,
+        user_id=user.id,
+        details={"commute": "short"},
+        entry_date=entry_date,
+        created_at=entry_date,
+    )
+
+
+def test_add_months_wraps_years():
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+
+def test_archive_folds_closed_months_into_daily_totals(db, user):
+    old = datetime(2020, 3, 14, 9, 0)
+    db.add_all([_footprint(user, old), _footprint(user, old, 5.0)])
+    db.add(_footprint(user, datetime.utcnow()))
+    db.commit()
+
+    archived = archive_closed_periods(db, keep_months=12)
+
+    assert archived == {"2020-03": 2}
+    assert db.query(models.Footprint).count() == 1
+    row = db.query(models.FootprintArchive).one()
+    assert row.entry_date == date(2020, 3, 14)
+    assert row.carbon_kg == 15.0
+    assert row.entry_count == 2
+
+
+def test_all_footprints_includes_archived_totals(client, db, user, auth_headers):
+    db.add(_footprint(user, datetime(2020, 3, 14), 15.0))
+    db.commit()
+    archive_closed_periods(db, keep_months=12)
+
+    response = client.get("/footprints/all", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert [r["carbon_kg"] for r in response.json()] == [15.0]
+
+
+def test_all_footprints_are_grouped_by_entry_date(client, db, user, auth_headers):
+    footprint = _footprint(user, datetime(2025, 1, 5, 9))
+    footprint.created_at = datetime(2026, 6, 1)
+    db.add(footprint)
+    db.commit()
+
+    response = client.get(
+        "/footprints/all",
+        params={"start": "2025-01-01T00:00:00", "end": "2025-02-01T00:00:00"},
+        headers=auth_headers,
+    )
+
+    assert [r["entry_date"][:10] for r in response.json()] == ["2025-01-05"]
+
+
+def test_archive_keeps_rows_backfilled_while_it_runs(db, user, monkeypatch):
+    from app.database import SessionLocal
+    from app.services import partitions
+
+    other = models.User(username="other", email="o@e.com", hashed_password="x")
+    db.add(other)
+    db.add(_footprint(user, datetime(2020, 3, 14)))
+    db.commit()
+
+    lock = partitions.stats.lock
+    backfills = [other, user]
+
+    def lock_after_backfill(session, user_ids):
+        # Another request commits a row for the month right after the scan
+        if backfills:
+            writer = SessionLocal()
+            writer.add(_footprint(backfills.pop(0), datetime(2020, 3, 20), 2.0))
+            writer.commit()
+            writer.close()
+        lock(session, user_ids)
+
+    monkeypatch.setattr(partitions.stats, "lock", lock_after_backfill)
+    archived = archive_closed_periods(db, keep_months=12)
+
+    # Every row that left the live table is in the archive, and only those
+    assert archived == {"2020-03": 3}
+    assert db.query(models.Footprint).count() == 0
+    totals = {
+        (row.user_id, row.entry_date): row.carbon_kg
+        for row in db.query(models.FootprintArchive)
+    }
+    assert totals == {
+        (user.id, date(2020, 3, 14)): 10.0,
+        (user.id, date(2020, 3, 20)): 2.0,
+        (other.id, date(2020, 3, 20)): 2.0,
+    }
+    tombstones = db.query(models.FootprintChange).filter_by(op="delete").count()
+    assert tombstones == 3
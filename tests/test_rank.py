@@ -0,0 +1,152 @@
+import random
+from datetime import date, datetime
+
+from app import models
+from app.database import insert_ignore
+from app.routes.footprints import load_rank_sketches
+from app.services import rollups
+from app.services.sketch import QuantileSketch, RELATIVE_ERROR
+
+
+def test_sketch_rank_within_error_bound():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(4, 1) for _ in range(5000)]
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+
+    values.sort()
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= RELATIVE_ERROR * exact
+
+
+def test_sketch_remove_and_merge_round_trip():
+    a, b = QuantileSketch(), QuantileSketch()
+    for value in (0, 5.0, 12.5, 80.0):
+        a.add(value)
+    b.add(12.5)
+    a.merge(b)
+    a.remove(12.5)
+
+    restored = QuantileSketch.from_dict(a.to_dict())
+    assert restored.count == 4
+    assert restored.rank(80.0) > restored.rank(12.5) > restored.rank(0)
+
+
+def test_rollups_follow_adds_and_removes(db, user):
+    footprints = [
+        models.Footprint(
+            activity_type=activity,
+            carbon_kg=carbon_kg,
+            user_id=user.id,
+            entry_date=datetime(2026, 5, 3),
+        )
+        for activity, carbon_kg in (("bus", 2.0), ("bus", 3.0), ("meat", 10.0))
+    ]
+    db.add_all(footprints)
+    rollups.record_added(db, user.id, footprints)
+    db.commit()
+
+    buses = db.query(models.Footprint).filter_by(activity_type="bus")
+    rollups.record_removed(db, user.id, buses)
+    buses.delete(synchronize_session=False)
+    db.commit()
+
+    totals = {
+        row.activity_type: (row.carbon_kg, row.entry_count)
+        for row in db.query(models.UserMonthlyTotal)
+    }
+    assert totals == {"bus": (0.0, 0), "meat": (10.0, 1), "all": (10.0, 1)}
+    bus_sketch = db.query(models.RankSketch).filter_by(activity_type="bus").one()
+    assert QuantileSketch.from_dict(bus_sketch.sketch).count == 0
+
+
+def test_rank_endpoint(client, auth_headers):
+    response = client.post(
+        "/footprints/",
+        json={
+            "activity_type": "bus",
+            "details": {"commute": "long"},
+            "entry_date": datetime.utcnow().isoformat(),
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    body = client.get("/footprints/rank", headers=auth_headers).json()
+
+    assert body["overall"]["carbon_kg"] == 3.4
+    assert body["overall"]["users"] == 1
+    assert [r["activity_type"] for r in body["by_activity"]] == ["bus"]
+    assert body["relative_error"] == RELATIVE_ERROR
+
+
+def test_sketches_are_sharded_by_user_and_merged_on_read(db, user):
+    other = models.User(username="other", email="o@e.com", hashed_password="x")
+    db.add(other)
+    db.commit()
+    month = datetime(2026, 5, 1).date()
+    for owner, carbon_kg in ((user, 2.0), (other, 30.0)):
+        footprint = models.Footprint(
+            activity_type="bus",
+            carbon_kg=carbon_kg,
+            user_id=owner.id,
+            entry_date=datetime(2026, 5, 3),
+        )
+        db.add(footprint)
+        rollups.record_added(db, owner.id, [footprint])
+        db.commit()
+
+    def shards():
+        return {
+            row.shard: QuantileSketch.from_dict(row.sketch).count
+            for row in db.query(models.RankSketch).filter_by(activity_type="bus")
+        }
+
+    assert shards() == {
+        rollups.sketch_shard(user.id): 1,
+        rollups.sketch_shard(other.id): 1,
+    }
+    merged = load_rank_sketches(db, month)["bus"]
+    assert merged.count == 2
+    assert merged.rank(30.0) > merged.rank(2.0)
+
+    rollups.rebuild(db)
+    assert shards() == {
+        rollups.sketch_shard(user.id): 1,
+        rollups.sketch_shard(other.id): 1,
+    }
+
+
+def test_sketch_rows_are_locked_in_key_order(db, user, monkeypatch):
+    month = date(2026, 5, 1)
+    locked = []
+    locked_sketch = rollups._locked_sketch
+    monkeypatch.setattr(
+        rollups,
+        "_locked_sketch",
+        lambda db, *key: locked.append(key) or locked_sketch(db, *key),
+    )
+    for activities in (("bus", "meat"), ("meat", "bus")):
+        totals = {}
+        for activity_type in activities:
+            rollups._add(totals, month, activity_type, 1.0, 1)
+        locked.clear()
+        rollups.apply_totals(db, user.id, totals)
+        assert len(locked) == 3 and locked == sorted(locked)
+    db.commit()
+
+    # A row created by a concurrent writer in the meantime is left alone
+    shard = rollups.sketch_shard(user.id)
+    for _ in range(2):
+        insert_ignore(
+            db,
+            models.RankSketch,
+            month=month,
+            activity_type="bus",
+            shard=shard,
+            sketch=QuantileSketch().to_dict(),
+        )
+    row = db.get(models.RankSketch, (month, "bus", shard))
+    assert QuantileSketch.from_dict(row.sketch).count == 1
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from app import models, schemas
+from app.services.scenarios import apply_substitutions, simulate
+
+
+def _sub(**kwargs):
+    return schemas.Substitution(**kwargs)
+
+
+def test_apply_substitutions_uses_calculator_defaults():
+    subs = [_sub(activity_type="driving", field="fuel_type", from_value="petrol", to_value="other")]
+    assert apply_substitutions(subs, "driving", {"commute": "long"}) == (
+        "driving",
+        {"commute": "long", "fuel_type": "other"},
+    )
+
+
+def test_apply_substitutions_remove_and_switch_activity():
+    subs = [
+        _sub(activity_type="flight", field="flight_type", from_value="short", remove=True),
+        _sub(activity_type="driving", to_activity_type="train"),
+    ]
+    assert apply_substitutions(subs, "flight", {"flight_type": "short"}) is None
+    assert apply_substitutions(subs, "flight", {"flight_type": "long"}) == (
+        "flight",
+        {"flight_type": "long"},
+    )
+    assert apply_substitutions(subs, "driving", {"commute": "short"}) == (
+        "train",
+        {"commute": "short"},
+    )
+
+
+def test_simulate_rescores_history_per_month(db, user):
+    start = datetime(2025, 1, 1)
+    db.add_all(
+        models.Footprint(
+            activity_type="meat",
+            carbon_kg=0.0,
+            user_id=user.id,
+            details={"servings_per_week": 5, "type": "beef"},
+            entry_date=start + timedelta(days=day),
+        )
+        for day in range(59)
+    )
+    db.commit()
+
+    result = simulate(
+        db,
+        user.id,
+        [_sub(activity_type="meat", field="type", from_value="beef", to_value="chicken")],
+    )
+
+    assert [m["month"] for m in result["months"]] == ["2025-01", "2025-02"]
+    assert result["months"][0]["before_kg"] == 31 * 27.0
+    assert result["months"][0]["after_kg"] == round(31 * 6.9, 1)
+    assert result["saved_kg"] == round(59 * (27.0 - 6.9), 1)
+
+
+def test_simulate_includes_archived_months(db, user):
+    db.add_all(
+        [
+            models.FootprintArchive(
+                user_id=user.id,
+                activity_type="meat",
+                entry_date=datetime(2024, 6, 1).date(),
+                carbon_kg=270.0,
+                entry_count=10,
+            ),
+            models.FootprintArchive(
+                user_id=user.id,
+                activity_type="bus",
+                entry_date=datetime(2024, 6, 2).date(),
+                carbon_kg=5.0,
+                entry_count=2,
+            ),
+        ]
+    )
+    db.commit()
+
+    # Detail-specific changes can't be applied to archived totals
+    beef = [_sub(activity_type="meat", field="type", from_value="beef", to_value="fish")]
+    result = simulate(db, user.id, beef)
+    assert result["months"] == [
+        {"month": "2024-06", "before_kg": 275.0, "after_kg": 275.0, "estimated": True}
+    ]
+
+    result = simulate(db, user.id, [_sub(activity_type="meat", remove=True)])
+    assert (result["before_kg"], result["after_kg"]) == (275.0, 5.0)
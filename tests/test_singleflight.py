@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return [{"carbon_kg": 1.0}]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("all", slow)))
+    leader.start()
+    started.wait()
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("all", slow)))
+        for _ in range(5)
+    ]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 6 and all(r is results[0] for r in results)
+    assert flight.stats() == {"executions": 1, "coalesced": 5, "in_flight": 0}
+
+
+def test_errors_reach_the_caller_and_are_not_cached():
+    flight = SingleFlight()
+
+    def boom():
+        raise ValueError("db down")
+
+    with pytest.raises(ValueError):
+        flight.do("all", boom)
+    assert flight.do("all", lambda: 42) == 42
+    assert flight.stats()["executions"] == 2
@@ -0,0 +1,155 @@
+from datetime import date, datetime, timedelta
+
+from app import models
+from app.services import rollups, stats
+from app.services.deletion import run_deletion_job
+
+
+def _add(db, user, activity_type, *days, carbon_kg=1.0):
+    footprints = [
+        models.Footprint(
+            activity_type=activity_type,
+            carbon_kg=carbon_kg,
+            user_id=user.id,
+            entry_date=datetime(2026, 3, day, 9),
+        )
+        for day in days
+    ]
+    db.add_all(footprints)
+    rollups.record_added(db, user.id, footprints)
+    db.commit()
+
+
+def _stats(db, user):
+    db.expire_all()
+    return db.get(models.UserStats, user.id)
+
+
+def test_stats_follow_inserts_backfills_and_deletes(db, user):
+    _add(db, user, "bus", 1, 2, 3)
+    _add(db, user, "meat", 5, carbon_kg=4.0)
+    row = _stats(db, user)
+    assert (row.carbon_kg, row.entry_count) == (7.0, 4)
+    assert row.activity_totals == {"bus": 3.0, "meat": 4.0}
+    assert (row.streak_start, row.streak_days) == (date(2026, 3, 5), 1)
+
+    # Filling the gap joins the two runs
+    _add(db, user, "bus", 4)
+    row = _stats(db, user)
+    assert (row.streak_start, row.last_entry_date) == (
+        date(2026, 3, 1),
+        date(2026, 3, 5),
+    )
+    assert row.streak_days == 5
+
+    job = models.DeletionJob(
+        user_id=user.id,
+        activity_type="bus",
+        start=datetime(2026, 3, 4),
+        end=datetime(2026, 3, 5),
+    )
+    db.add(job)
+    db.commit()
+    run_deletion_job(job.id)
+
+    row = _stats(db, user)
+    assert (row.carbon_kg, row.entry_count) == (7.0, 4)
+    assert (row.streak_start, row.streak_days) == (date(2026, 3, 5), 1)
+    assert stats.reconcile(db) == []
+
+
+def test_reconcile_repairs_drift(db, user):
+    _add(db, user, "bus", 1, 2)
+    row = _stats(db, user)
+    row.entry_count = 99
+    row.streak_days = 7
+    db.commit()
+
+    assert stats.reconcile(db, repair=False) == [user.id]
+    assert stats.reconcile(db) == [user.id]
+    row = _stats(db, user)
+    assert (row.entry_count, row.streak_days) == (2, 2)
+    assert stats.reconcile(db) == []
+
+
+def test_profile_stats(client, auth_headers):
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    for days_ago, activity_type in ((2, "meat"), (1, "bus"), (0, "bus")):
+        client.post(
+            "/footprints/",
+            json={
+                "activity_type": activity_type,
+                "details": {},
+                "entry_date": (today - timedelta(days=days_ago)).isoformat(),
+            },
+            headers=auth_headers,
+        )
+
+    body = client.get("/profile/stats", headers=auth_headers).json()
+    assert body["entry_count"] == 3
+    assert body["top_activity"] == "bus"
+    assert body["current_streak_days"] == 3
+    assert body["last_entry_date"] == today.date().isoformat()
+    assert 0 < body["this_month_kg"] <= body["lifetime_kg"]
+
+
+def test_future_recurring_entries_do_not_count_towards_the_streak(
+    client, auth_headers
+):
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def post(entry_date, **fields):
+        client.post(
+            "/footprints/",
+            json={
+                "activity_type": "bus",
+                "details": {},
+                "entry_date": entry_date.isoformat(),
+                **fields,
+            },
+            headers=auth_headers,
+        )
+
+    post(today - timedelta(days=1), is_recurring=True, recurrence_frequency="daily")
+    body = client.get("/profile/stats", headers=auth_headers).json()
+    assert body["current_streak_days"] == 2
+    assert body["last_entry_date"] == today.date().isoformat()
+
+    # A run that lies wholly in the future is counted back from today
+    post(today + timedelta(days=200))
+    body = client.get("/profile/stats", headers=auth_headers).json()
+    assert body["current_streak_days"] == 2
+    assert body["last_entry_date"] == today.date().isoformat()
+
+
+def test_streak_behind_future_runs_is_read_without_scanning(
+    client, auth_headers, db, monkeypatch
+):
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    entries = [
+        {
+            "entry_date": (today + timedelta(days=3)).isoformat(),
+            "is_recurring": True,
+            "recurrence_frequency": "weekly",
+        },
+        {"entry_date": (today - timedelta(days=1)).isoformat()},
+        {"entry_date": today.isoformat()},
+        {"entry_date": (today - timedelta(days=5)).isoformat()},
+    ]
+    for entry in entries:
+        client.post(
+            "/footprints/",
+            json={"activity_type": "bus", "details": {}, **entry},
+            headers=auth_headers,
+        )
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("summary read the footprint history")
+
+    monkeypatch.setattr(stats, "_entry_days", no_scan)
+    body = client.get("/profile/stats", headers=auth_headers).json()
+    assert body["current_streak_days"] == 2
+    assert body["last_entry_date"] == today.date().isoformat()
+
+    monkeypatch.undo()
+    assert stats.reconcile(db) == []